@@ -1,5 +1,8 @@
 if __name__ == "__main__":
     import sys
+    from multiprocessing import freeze_support
     from pkg import Flabel
 
+    freeze_support()  # multi-sheet loads run worker processes
+
     sys.exit(Flabel.run())
@@ -63,6 +63,8 @@ from PySide6.QtWidgets import (
     QListWidgetItem,
     QComboBox,
     QRadioButton,
+    QProgressBar,
+    QPushButton,
 )
 from PySide6.QtCore import (
     Qt,
@@ -77,6 +79,8 @@ from PySide6.QtCore import (
     QRegularExpression,
     QMarginsF,
     QCoreApplication,
+    QThread,
+    Signal,
 )
 
 from PySide6.QtPrintSupport import QPrinter, QPrintDialog, QAbstractPrintDialog
@@ -101,13 +105,17 @@ from .ui.ui_SearchDialog import Ui_SearchDialog
 from .ui.ui_SettingsDialog import Ui_SettingsDialog
 from .ui.ui_ExcelDialog import Ui_ExcelDialog
 from .ui.ui_ExploreDialog import Ui_ExploreDialog
-from .utils import exttools, pdfprep, labeltools
+from .utils import exttools, pdfprep, labeltools, labeltable, labelstore
+from .utils import sheetcache, rowreaders, multiload, layoutplan, rasterstore
 from .utils import zplparser as zpp
 import qdarktheme
 import re
+import sqlite3
 import traceback
 import code
 import pathlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor, wait
 
 from openpyxl import load_workbook
 
@@ -119,16 +127,37 @@ class UI(QMainWindow):
         # Variables and API
         self.preview_scene = PreviewDisplay(self)
         self.label_rect = None
-        self.temp_label_paths = []
+        self.label_ids = []  # row hashes of the labels shown, in order
+        self.label_images = []  # labels composed by the last gen_from_selection
         self.label_rect = QRect()
         self.END_COLUMN_POSITION = 140
         self.START_COLUMN_POSITION = 45
+        self.INGEST_CHUNK_SIZE = 500
+        self.BROWSER_PAGE_SIZE = 100  # rows filled past the visible ones
+        self.LABEL_RASTER_MB = 128  # composed labels kept besides the shown ones
+        self.ingest_thread = None
+        self.ingest_worker = None
+        self.ingest_progress_bar = None
+        self.ingest_cancel_button = None
         self.quantities = None
         self.selected_row_indexes = []
         self.label_excel_filepath = None
+        self.selected_sheet = None  # reader of the chosen sheet
+        self.selected_sheet_key = None  # its cache key, taken when it was opened
         self.quantity_excel_filename = None
         self.label_texts = None
+        self.explore_dialog = None
+        self.source_requests = []  # [(file, sheet name, optional)] to load
+        self.label_sources = []  # [(file, sheet name)] loaded, in order
+        self.label_source_starts = []  # label_texts index of each source's first row
+        self.browser_indexes = range(0)  # browser row -> label_texts index
+        self.browser_rows_of = None  # label_texts index -> browser row
+        self.browser_filled = set()  # browser rows that have their items
+        self.browser_show_cols = {}
+        self.label_renders = {}  # {row hash: (element, coords, desc)}
+        self.label_rasters = rasterstore.LabelRasterStore(self.LABEL_RASTER_MB)
         self.element_fn_map = None
+        self.layout_plan = None  # compiled from label_info when settings change
         self.selected_rows_info = []
         self.quantities_loaded = False
         self.global_settings = GlobalSettings()
@@ -180,6 +209,9 @@ class UI(QMainWindow):
             self.view_label_selection
         )
         self.ui.label_browser_table.itemChanged.connect(self.edit_labels)
+        self.ui.label_browser_table.verticalScrollBar().valueChanged.connect(
+            self.fill_visible_rows
+        )
 
         self.ui.load_quantity_button.clicked.connect(self.load_quantity_clicked)
         self.ui.explore_button.clicked.connect(self.explore_clicked)
@@ -201,30 +233,25 @@ class UI(QMainWindow):
             QHeaderView.ResizeToContents
         )
 
-    def load_browser_model(
-        self, show_cols: dict[str, bool], rows: dict[str, str]
-    ) -> None:
+    def load_browser_model(self, show_cols: dict[str, bool], indexes) -> None:
+        """
+        indexes: the label_texts indexes to show, in order, a range for all
+        rows, rows only get their items once scrolled into view
+        """
         self.ui.label_browser_table.itemChanged.disconnect(self.edit_labels)
         try:
             # self.label_model = LabelBrowserModel(labels)
             column_headers = [col for col, show_bool in show_cols.items() if show_bool]
-            self.ui.label_browser_table.setRowCount(len(rows))
+            self.ui.label_browser_table.setRowCount(0)
             self.ui.label_browser_table.setColumnCount(len(column_headers))
             self.ui.label_browser_table.setHorizontalHeaderLabels(column_headers)
-
-            for i, label_row in enumerate(rows):
-                i_item = QTableWidgetItem(str(i + 1))
-                self.ui.label_browser_table.setVerticalHeaderItem(i, i_item)
-                j = 0
-                for h, l in label_row.items():
-                    if (h in show_cols.keys()) and show_cols[h]:
-                        l_item = QTableWidgetItem(l)
-                        self.ui.label_browser_table.setItem(i, j, l_item)
-                        j += 1
+            self.browser_show_cols = show_cols
+            self.browser_filled = set()
+            self.set_browser_rows(indexes)
             # CLEAR EVERYTHING, done here bcos of settings page
             self.element_fn_map = {}
             self.element_maps = {}
-            self.temp_label_paths = []
+            self.label_ids = []
             self.img_coords_maps = {}
             self.desc_maps = {}
             self.quantities = None
@@ -255,6 +282,59 @@ class UI(QMainWindow):
                 info_dialog.exec()
         self.ui.label_browser_table.itemChanged.connect(self.edit_labels)
 
+    def set_browser_rows(self, indexes) -> None:
+        """
+        Sets the label_texts indexes the browser shows, also used to grow
+        the browser when rows are streamed in chunks from the excel file
+        """
+        self.browser_indexes = indexes
+        self.browser_rows_of = None
+        self.ui.label_browser_table.setRowCount(len(indexes))
+        self.fill_visible_rows()
+
+    def fill_visible_rows(self, *_) -> None:
+        """
+        Creates the items of the rows in view (plus a page below), the
+        browser never holds items for rows that weren't scrolled to
+        """
+        table = self.ui.label_browser_table
+        row_count = table.rowCount()
+        if not row_count or self.label_texts is None:
+            return
+        first = max(table.rowAt(0), 0)
+        last = table.rowAt(table.viewport().height() - 1)
+        last = row_count - 1 if last < 0 else last
+        last = min(last + self.BROWSER_PAGE_SIZE, row_count - 1)
+        pending = [r for r in range(first, last + 1) if r not in self.browser_filled]
+        if not pending:
+            return
+        headers = [
+            h for h in self.label_texts.headers if self.browser_show_cols.get(h, False)
+        ]
+        label_rows = self.label_texts.rows(self.browser_indexes[r] for r in pending)
+        # blocked rather than disconnected, load_browser_model may have done so
+        signals_blocked = table.blockSignals(True)
+        for i, label_row in zip(pending, label_rows):
+            # numbered by table index, so filtered views keep the excel rows
+            i_item = QTableWidgetItem(str(label_row.index + 1))
+            table.setVerticalHeaderItem(i, i_item)
+            for j, h in enumerate(headers):
+                table.setItem(i, j, QTableWidgetItem(label_row[h]))
+        table.blockSignals(signals_blocked)
+        self.browser_filled.update(pending)
+
+    def get_browser_row(self, label_index: int) -> int | None:
+        # browser row showing label_texts[label_index], None if filtered out
+        if isinstance(self.browser_indexes, range):
+            if label_index in self.browser_indexes:
+                return self.browser_indexes.index(label_index)
+            return None
+        if self.browser_rows_of is None:
+            self.browser_rows_of = {
+                index: row for row, index in enumerate(self.browser_indexes)
+            }
+        return self.browser_rows_of.get(label_index)
+
     def load_element_model(
         self,
         label_map: dict[int, str],
@@ -314,6 +394,10 @@ class UI(QMainWindow):
     def view_label_selection(self, item=None) -> None:
         """
         Updates the currently selected labels for generation
+
+        renders are kept in label_renders by row hash, the composed labels
+        in label_rasters, so only rows that were never rendered (or changed
+        or were evicted since) go through the label pipeline
         """
         self.selected_rows_info.clear()
         self.selected_row_indexes.clear()
@@ -322,11 +406,16 @@ class UI(QMainWindow):
         )
         if not self.selected_row_indexes:
             return
-        self.progress_dialog = ProgressDialog(max=len(self.selected_row_indexes))
+        if self.layout_plan is None:
+            self.compile_layout_plan()  # clears the renders, so before the lookups
+        row_hashes = []
+        pending_hashes = {}  # {row hash: selected row info}, keeps order
         for i in self.selected_row_indexes:
             _selected_row_info = []
+            label_index = self.get_label_index(i.row())
+            label_row = self.label_texts[label_index]
             for data in self.label_info.label_data:
-                selected_text = self.label_texts[i.row()][data]
+                selected_text = label_row[data]
                 _selected_row_info.append(
                     (
                         selected_text,
@@ -334,15 +423,51 @@ class UI(QMainWindow):
                     )
                 )
             self.selected_rows_info.append(_selected_row_info)
-        self.gen_from_selection(self.selected_rows_info, self.progress_dialog)
+            row_hash = self.label_texts.row_hash(label_index)
+            row_hashes.append(row_hash)
+            if row_hash not in self.label_rasters:
+                pending_hashes[row_hash] = _selected_row_info
+        # before the new labels go in, so they can't evict each other
+        self.label_rasters.shown(row_hashes)
+        if pending_hashes:
+            self.progress_dialog = ProgressDialog(max=len(pending_hashes))
+            self.gen_from_selection(list(pending_hashes.values()), self.progress_dialog)
+            for row_hash, label_image, render in zip(
+                pending_hashes,
+                self.label_images,
+                zip(
+                    self.element_maps,
+                    self.img_coords_maps,
+                    self.desc_maps,
+                ),
+            ):
+                self.label_renders[row_hash] = render
+                self.label_rasters.put(row_hash, label_image)
+            self.label_images = []
+            # renders whose label was evicted are made again when selected
+            self.label_renders = {
+                h: r for h, r in self.label_renders.items() if h in self.label_rasters
+            }
+        else:
+            self.element_fn_map = self.layout_plan.element_fn_map
+        self.label_ids = [h for h in row_hashes if h in self.label_rasters]
+        renders = [self.label_renders[h] for h in self.label_ids]
+        (
+            self.element_maps,
+            self.img_coords_maps,
+            self.desc_maps,
+        ) = (
+            (list(r) for r in zip(*renders)) if renders else ([], [], [])
+        )
         self.update_preview(
-            self.temp_label_paths,
+            self.label_ids,
             labeltools.get_label_size(self.label_info.label_settings),
         )
         self.load_element_model(self.label_info.label_map, self.desc_maps)
 
     def gen_from_selection(self, selected_rows_info, progress_dialog):
         label_size_pix = labeltools.get_label_size(self.label_info.label_settings)
+        label_images = []
 
         try:
             self.position_text_pair_rows = labeltools.text_mapping(
@@ -350,17 +475,16 @@ class UI(QMainWindow):
                 self.label_info.label_map,
                 selected_rows_info,
             )
-            _element_fn_map = labeltools.element_mapper_factory(
-                self.label_info.label_map
-            )
-            self.element_fn_map = dict(_element_fn_map)
+            if self.layout_plan is None:
+                self.compile_layout_plan()
+            self.element_fn_map = self.layout_plan.element_fn_map
 
             (
                 self.element_maps,
                 self.label_info.module_size,
             ) = labeltools.create_element_maps(
-                element_region_map=self.label_info.element_regions_map,
-                regions=self.label_info.regions,
+                element_region_map=self.layout_plan.element_regions_map,
+                regions=self.layout_plan.regions,
                 element_fn_map=self.element_fn_map,
                 position_text_pair_rows=self.position_text_pair_rows,
                 font_name=self.label_info.font_name,
@@ -370,39 +494,41 @@ class UI(QMainWindow):
                 self.label_info.module_size,
                 self.label_info.module_size,
             )
+            self.layout_plan.set_margins(self.label_info.margins)
             self.img_coords_maps, self.desc_maps = labeltools.gen_asset_maps(
                 self.element_maps,
-                self.element_fn_map,
-                self.label_info.element_regions_map,
-                self.label_info.label_map,
-                self.label_info.regions,
-                self.label_info.element_resizable_map,
-                self.label_info.margins,
-                self.label_info.alignment,
+                self.layout_plan,
                 progress_dialog,
+                self.global_settings.bilevel,
             )
-            temp_label_array = labeltools.gen_labels(
-                self.img_coords_maps, label_size_pix, self.label_info.margins
+            label_images = labeltools.gen_labels(
+                self.img_coords_maps,
+                label_size_pix,
+                self.label_info.margins,
+                self.global_settings.bilevel,
             )
 
         except AssertionError as ass:
-            trace_exc = traceback.format_exc(ass)
+            trace_exc = traceback.format_exc()
             print(f"Error loading label selection: {trace_exc}")
             error_dialog = ErrorDialog("Error loading label selection", self)
             ret = error_dialog.exec()
             if ret == QDialog.Accepted:
                 info_dialog = InfoDialog(
-                    "One of your labels selected is of a different specification", self
+                    str(ass)
+                    or "One of your labels selected is of a different specification",
+                    self,
                 )
                 info_dialog.exec()
 
-        self.temp_label_paths = [t.name for t in temp_label_array]
+        self.label_images = list(label_images)
 
     def update_preview(
-        self, temp_label_array: list[object], label_size_pix: tuple[int, int]
+        self, label_ids: list[int], label_size_pix: tuple[int, int]
     ) -> None:
+        label_qimages = [label_qimage(self.label_rasters, i) for i in label_ids]
         updated_rects, bottom_right_point, label_rect = self.preview_scene.load_scene(
-            temp_label_array, label_size_pix
+            label_qimages, label_size_pix
         )
         if label_rect is None:
             return
@@ -455,8 +581,8 @@ class UI(QMainWindow):
         explore dialog that allows user to view by category or value
         """
 
-        def view_by_category(rows):
-            self.load_browser_model(self.global_settings.show_cols, rows)
+        def view_by_category(indexes):
+            self.load_browser_model(self.global_settings.show_cols, indexes)
 
         self.explore_dialog = ExploreDialog(self.label_texts, view_by_category, self)
         self.explore_dialog.show()
@@ -465,10 +591,19 @@ class UI(QMainWindow):
     Resize overwrites and limitations
     """
 
+    def closeEvent(self, event) -> None:  # overriding function
+        self.cancel_ingest()
+        if self.ingest_thread is not None:
+            self.ingest_thread.quit()
+            self.ingest_thread.wait()
+        self.close_label_texts()
+        QMainWindow.closeEvent(self, event)
+
     def resizeEvent(self, event) -> None:  # overriding function
         self.resize_viewport()
         self.resize_splitter()
         QMainWindow.resizeEvent(self, event)
+        self.fill_visible_rows()
 
     def resize_viewport(self):
         self.ui.preview_display.fitInView(self.label_rect, Qt.KeepAspectRatio)
@@ -521,16 +656,17 @@ class UI(QMainWindow):
             #     lambda: self.ui.select_all_check.setCheckState(Qt.CheckState.Unchecked)
             # )
 
+    def get_browser_headers(self) -> list[str]:
+        return [
+            h for h in self.label_texts.headers if self.browser_show_cols.get(h, False)
+        ]
+
     def search_table(self, input):
-        if not input:
+        if not input or self.label_texts is None:
             return
-        self.matching_items = self.ui.label_browser_table.findItems(
-            input, Qt.MatchContains
-        )
-        if self.matching_items:
-            self.item_indexes = []
-            for item in self.matching_items:
-                self.item_indexes.append(item.row() + 1)
+        matching_indexes = self.label_texts.search(input, self.get_browser_headers())
+        if matching_indexes:
+            self.item_indexes = [index + 1 for index in matching_indexes]
 
     def search_select(self, max_index) -> None:
         search_dialog = SearchDialog(max_index, self)
@@ -541,21 +677,11 @@ class UI(QMainWindow):
                 selections = search_dialog.get_specific_selection()
             elif search_dialog.ui.matching_checkbox.isChecked():
                 starts_with, ends_with = search_dialog.get_matching_selection()
-                if starts_with and ends_with:
-                    pattern = f"^{re.escape(starts_with)}.*{re.escape(ends_with)}$"
-                    self.matching_items = self.ui.label_browser_table.findItems(
-                        pattern, Qt.MatchRegularExpression
-                    )
-                elif starts_with and not ends_with:
-                    self.matching_items = self.ui.label_browser_table.findItems(
-                        starts_with, Qt.MatchStartsWith
+                if starts_with or ends_with:
+                    matching_indexes = self.label_texts.match(
+                        starts_with, ends_with, self.get_browser_headers()
                     )
-                elif ends_with and not starts_with:
-                    self.matching_items = self.ui.label_browser_table.findItems(
-                        starts_with, Qt.MatchEndsWith
-                    )
-                for item in self.matching_items:
-                    selections.append(item.row() + 1)
+                    selections = [index + 1 for index in matching_indexes]
             else:
                 selections = search_dialog.get_range()
             if not selections:  # empty search
@@ -566,80 +692,53 @@ class UI(QMainWindow):
     def open_file_dialog(self, type: str) -> None:
         match type:
             case "labels":
-                label_excel_filepath = QFileDialog.getOpenFileName(
+                label_excel_filepaths, _ = QFileDialog.getOpenFileNames(
                     parent=self,
                     caption=QObject.tr("Open Excel File"),
                     dir=self.global_settings.default_dir,
-                    filter=QObject.tr("Excel Files (*.xlsx *.xlsm *.xltx *.xltm *xls)"),
+                    filter=QObject.tr(
+                        "Label Files (*.xlsx *.xlsm *.xltx *.xltm *.xls *.csv *.tsv *.txt);;"
+                        "Excel Files (*.xlsx *.xlsm *.xltx *.xltm *.xls);;"
+                        "CSV Files (*.csv *.tsv *.txt)"
+                    ),
                 )
-                if label_excel_filepath == ("", ""):
+                if not label_excel_filepaths:
                     return
                 else:
-                    self.label_excel_filepath = label_excel_filepath[0]
-                    _, file_ext = os.path.splitext(self.label_excel_filepath)
-                    if file_ext == ".xls":
-                        self.use_xls = True
-                    else:
-                        self.use_xls = False
-                xl_worksheets, xl_worksheet_names = exttools.get_worksheets(
-                    self.label_excel_filepath, self.use_xls
-                )
+                    # the first file sets the columns, the others must have them
+                    self.label_excel_filepath = label_excel_filepaths[0]
+                sheet_readers = rowreaders.open_readers(self.label_excel_filepath)
                 self.excel_dialog = ExcelDialog(
                     filepath=self.label_excel_filepath,
-                    use_xls=self.use_xls,
-                    xl_worksheets=xl_worksheets,
-                    xl_worksheet_names=xl_worksheet_names,
+                    sheet_readers=sheet_readers,
+                    file_count=len(label_excel_filepaths),
                     label_info=self.label_info,
                     global_settings=self.global_settings,
                     parent=self,
                 )
                 ret = self.excel_dialog.exec()
+                for reader in sheet_readers:
+                    reader.close()
                 if ret == QDialog.Rejected:
                     return
                 else:
                     (
-                        self.selected_sheet,
+                        sheet_name,
                         self.header_dict,
                         self.label_info,
                         self.global_settings,
                     ) = self.excel_dialog.save_settings()
+                    self.compile_layout_plan()
+                    all_sheets = self.excel_dialog.ui.all_sheets_checkbox.isChecked()
+                self.source_requests = self.get_source_requests(
+                    label_excel_filepaths, sheet_name, all_sheets
+                )
+                # only the chosen sheet is opened, once the dialog is accepted
+                self.open_selected_sheet(sheet_name)
 
-                try:
-                    (
-                        rows,
-                        self.label_info.label_data,  # get the valid, updated label data
-                        self.label_info.data_not_incl,
-                        self.global_settings.show_cols,
-                    ) = exttools.read_excel(
-                        use_xls=self.use_xls,
-                        sheet=self.selected_sheet,
-                        header_dict=self.header_dict,
-                        regex=self.label_info.label_regex,
-                        label_data=self.label_info.label_data,
-                        show_cols=self.global_settings.show_cols,
-                    )
-                    self.selected_row_indexes = []
-                    if self.label_info.data_not_incl:
-                        self.omit_invalid_data()
-                        info_dialog = InfoDialog(
-                            f"Data fields {', '.join(self.label_info.data_not_incl)} contain invalid characters, omitting..."
-                        )
-                        info_dialog.setWindowTitle("Invalid Data")
-                        _ = info_dialog.exec()
-
-                except Exception as exc:
-                    trace_exc = traceback.format_exc(exc)
-                    print(f"Excel Error {trace_exc}")
-                    error_dialog = ErrorDialog("Error loading label excel file", self)
-                    ret = error_dialog.exec()
-                    if ret == QDialog.Accepted:
-                        info_dialog = InfoDialog(str(exc), self)
-                        info_dialog.exec()
-
-                else:
-                    self.label_texts = rows
-                    self.load_browser_model(self.global_settings.show_cols, rows)
-                    self.change_button_states("labels")
+                self.label_renders.clear()
+                self.label_rasters.clear()
+                self.ingest_labels(self.labels_loaded, "Error loading label excel file")
 
             case "pdf":
                 pdf_path = QFileDialog.getSaveFileName(
@@ -653,7 +752,9 @@ class UI(QMainWindow):
                 self.global_settings.pdf_path = pdf_path[0]
                 pdf_starter = pdfprep.create_pdf_object()
                 self.pdf = pdfprep.pdf_generator(
-                    pdf_starter, self.global_settings.pdf_path, self.temp_label_paths
+                    pdf_starter,
+                    self.global_settings.pdf_path,
+                    self.label_rasters.images(self.label_ids),
                 )
 
             case "zpl":
@@ -686,6 +787,45 @@ class UI(QMainWindow):
                 )
                 self.quantities = [str(i[0] for i in rows)]
 
+    def get_source_requests(
+        self, files: list[str], sheet_name: str, all_sheets: bool
+    ) -> list[tuple[str, str, bool]]:
+        """
+        [(file, sheet name, optional)] to load, with all_sheets every sheet
+        that has the chosen columns is loaded (optional, skipped otherwise),
+        else the sheet of that name or the first sheet of every file
+        """
+        source_requests = []
+        for file in files:
+            if file == files[0] and not all_sheets:
+                source_requests.append((file, sheet_name, False))
+                continue
+            sheet_names = rowreaders.sheet_names(file)
+            if all_sheets:
+                source_requests.extend((file, name, True) for name in sheet_names)
+            elif sheet_name in sheet_names:
+                source_requests.append((file, sheet_name, False))
+            else:
+                source_requests.append((file, sheet_names[0], False))
+        return source_requests
+
+    def get_label_source(self, label_index: int) -> tuple[str, str, int]:
+        # (file, sheet name, excel row) a label was read from
+        return multiload.source_of(
+            self.label_source_starts, self.label_sources, label_index
+        )
+
+    def labels_loaded(self) -> None:
+        self.selected_row_indexes = []
+        if self.label_info.data_not_incl:
+            self.omit_invalid_data()
+            info_dialog = InfoDialog(
+                f"Data fields {', '.join(self.label_info.data_not_incl)} contain invalid characters, omitting..."
+            )
+            info_dialog.setWindowTitle("Invalid Data")
+            _ = info_dialog.exec()
+        self.change_button_states("labels")
+
     def edit_quantity(self, item: object) -> None:
         browser_row = item.row()
         qty_row = self.ui.element_browser.verticalHeaderItem(browser_row)
@@ -694,12 +834,20 @@ class UI(QMainWindow):
         self.quantities[int(qty_row.text())] = item.text()
 
     def edit_labels(self, item: object) -> None:
-        browser_row = item.row()
         browser_col = item.column()
-        label_texts_row = self.ui.label_browser_table.verticalHeaderItem(browser_row)
-        if label_texts_row is None:
+        header_item = self.ui.label_browser_table.horizontalHeaderItem(browser_col)
+        if header_item is None:
             return
-        self.label_texts[int(label_texts_row.text())][browser_col] = item.text()
+        self.label_texts.set(
+            self.get_label_index(item.row()), header_item.text(), item.text()
+        )
+
+    def get_label_index(self, browser_row: int) -> int:
+        """
+        browser rows can be filtered (explore), browser_indexes maps
+        them back to label_texts
+        """
+        return self.browser_indexes[browser_row]
 
     def get_quantities(self):
         """
@@ -715,41 +863,99 @@ class UI(QMainWindow):
         """
         browser_header_rows = []
         for i in self.selected_row_indexes:
-            browser_row = i.row()
-            browser_header_row_item = self.ui.label_browser_table.verticalHeaderItem(
-                browser_row
-            )
-            browser_header_rows.append(int(browser_header_row_item.text()))
+            browser_header_rows.append(self.get_label_index(i.row()) + 1)
         browser_header_rows.sort()
         return browser_header_rows
 
+    def open_selected_sheet(self, sheet_name: str) -> None:
+        """
+        (re)opens the reader of the chosen sheet, the cache key is taken
+        first so rows read later are never cached under a newer file's key
+        """
+        if self.selected_sheet is not None:
+            self.selected_sheet.close()
+        self.selected_sheet_key = sheetcache.cache_key(
+            self.label_excel_filepath, sheet_name
+        )
+        self.selected_sheet = rowreaders.open_reader(
+            self.label_excel_filepath,
+            sheet_name,
+            self.global_settings.xlsx_backend,
+        )
+
     def global_refresh(self):
         """
         refreshes all UI elements and reloads excel and labels with new settings (if changed)
         also reloads the element browser by load_element_model
         """
-        try:
-            (
-                rows,
-                self.label_info.label_data,
-                self.label_info.data_not_incl,
-                self.global_settings.show_cols,
-            ) = exttools.read_excel(
-                use_xls=self.use_xls,
-                sheet=self.selected_sheet,
-                header_dict=self.header_dict,
-                regex=self.label_info.label_regex,
-                label_data=self.label_info.label_data,
-                show_cols=self.global_settings.show_cols,
-            )
-        except Exception as exc:
-            trace_exc = traceback.format_exc(exc)
-            print(f"Excel file error {trace_exc}")
-            error_dialog = ErrorDialog("Error refreshing label excel file", self)
-            ret = error_dialog.exec()
-            if ret == QDialog.Accepted:
-                info_dialog = InfoDialog(str(exc), self)
-                info_dialog.exec()
+        selections = self.get_selected_label_rows()
+        if self.selected_sheet is not None and len(self.source_requests) <= 1:
+            # the old reader may still hold the file as it was when opened
+            try:
+                self.open_selected_sheet(self.selected_sheet.name)
+            except Exception as exc:
+                self.ingest_failed(exc, "Error refreshing label excel file")
+                return
+        # copied, a label store next to the file is rebuilt in place
+        previous_hashes = (
+            array("Q", self.label_texts.hashes())
+            if self.label_texts is not None
+            else None
+        )
+        self.ingest_labels(
+            lambda: self.labels_refreshed(previous_hashes, selections),
+            "Error refreshing label excel file",
+        )
+
+    def labels_refreshed(self, previous_hashes, selections) -> None:
+        self.prune_label_renders(previous_hashes)
+        self.refresh_labels(selections)
+
+    def prune_label_renders(self, previous_hashes) -> None:
+        """
+        Drops the renders of rows that changed or were removed since
+        the previous load, unchanged rows keep theirs
+        """
+        if previous_hashes is None or not self.label_renders:
+            return
+        changes = self.label_texts.diff(previous_hashes)
+        current_hashes = set(self.label_texts.hashes())
+        for index in changes["modified"] + changes["removed"]:
+            row_hash = previous_hashes[index]
+            if row_hash not in current_hashes:
+                self.label_renders.pop(row_hash, None)
+                self.label_rasters.pop(row_hash)
+
+    def get_selected_label_rows(self) -> list[int]:
+        # 1-indexed label rows, as used by select_searched
+        return [
+            self.get_label_index(i.row()) + 1
+            for i in self.ui.label_browser_table.selectionModel().selectedRows()
+        ]
+
+    def revalidate_labels(self, refresh=True):
+        """
+        Applies changed settings to the rows already loaded, only the columns
+        whose pattern changed are re-checked and the excel file is not re-read
+        """
+        selections = self.get_selected_label_rows()
+        changed = self.row_validator.update_patterns(
+            self.label_info.label_regex, self.label_info.column_regex
+        )
+        self.row_validator.recheck(self.label_texts, changed)
+        skip_cols = self.row_validator.invalid_headers()
+        self.global_settings.show_cols.update({col: False for col in skip_cols})
+        (
+            self.label_info.label_data,
+            self.label_info.data_not_incl,
+        ) = exttools.split_label_data(self.label_info.label_data, skip_cols)
+        self.load_browser_model(
+            self.global_settings.show_cols, range(len(self.label_texts))
+        )
+        if refresh:
+            self.refresh_labels(selections)
+
+    def refresh_labels(self, selections=None):
         if self.label_info.data_not_incl:
             self.omit_invalid_data()
             info_dialog = InfoDialog(
@@ -757,10 +963,275 @@ class UI(QMainWindow):
             )
             info_dialog.setWindowTitle("Invalid Data")
             _ = info_dialog.exec()
-        self.label_texts = rows
-        self.load_browser_model(self.global_settings.show_cols, rows)
         self.preview_scene.clear()
-        self.view_label_selection()
+        if selections:
+            self.select_searched(selections)
+        else:
+            self.view_label_selection()
+
+    def ingest_labels(self, on_finished, error_msg: str) -> None:
+        """
+        Streams the selected sheet into label_texts on an IngestWorker thread,
+        the browser is filled chunk by chunk as rows arrive so the first rows
+        can be browsed while the rest are still read
+
+        on_finished is called once every row is in (or the load was cancelled)
+        """
+        if len(self.source_requests) > 1:
+            self.ingest_sources(on_finished, error_msg)
+            return
+        try:
+            column_indices = exttools.get_column_indices(
+                self.header_dict,
+                self.label_info.label_data,
+                self.global_settings.show_cols,
+            )
+            sheet_name = self.selected_sheet.name
+            store_mode = self.global_settings.label_store
+            if store_mode == "memory":
+                cached = sheetcache.load(
+                    self.global_settings.cache_dir,
+                    self.label_excel_filepath,
+                    sheet_name,
+                    self.header_dict,
+                    column_indices,
+                )
+            elif store_mode == "file":
+                cached = labelstore.load(
+                    self.label_excel_filepath,
+                    sheet_name,
+                    self.header_dict,
+                    column_indices,
+                )
+            else:
+                cached = None
+        except Exception as exc:
+            self.ingest_failed(exc, error_msg)
+            return
+        self.close_label_texts()
+        self.label_sources = [(self.label_excel_filepath, sheet_name)]
+        self.label_source_starts = [0]
+        if cached is not None:
+            self.label_texts, validator_state = cached
+            self.row_validator = exttools.RowValidator.from_state(
+                self.header_dict, validator_state
+            )
+            self.revalidate_labels(refresh=False)
+            on_finished()
+            return
+
+        self.row_validator = exttools.RowValidator(
+            self.header_dict,
+            column_indices,
+            self.label_info.label_regex,
+            self.label_info.column_regex,
+        )
+        # the worker hides invalid columns in its own copy, the browser
+        # keeps the initial columns so every chunk lines up with the headers
+        show_cols = self.global_settings.show_cols.copy()
+        self.label_texts = self.new_label_texts(store_mode, sheet_name)
+        self.load_browser_model(show_cols, range(0))
+        self.change_button_states("loading")
+
+        self.ingest_worker = IngestWorker(
+            {
+                "reader": self.selected_sheet,
+                "header_dict": self.header_dict,
+                "regex": self.label_info.label_regex,
+                "label_data": self.label_info.label_data,
+                "show_cols": show_cols.copy(),
+                "validator": self.row_validator,
+            },
+            self.INGEST_CHUNK_SIZE,
+        )
+        self.start_ingest_worker(
+            self.append_label_rows,
+            lambda skip_cols, cancelled: self.finish_ingest(
+                skip_cols, cancelled, sheet_name, on_finished
+            ),
+            error_msg,
+        )
+
+    def close_label_texts(self) -> None:
+        """
+        closes a sqlite label store before the next load replaces it, a
+        store next to the file is recreated in place by labelstore.create
+        """
+        if self.explore_dialog is not None:
+            self.explore_dialog.close()  # it browses the old rows
+            self.explore_dialog = None
+        if isinstance(self.label_texts, labelstore.LabelStore):
+            self.label_texts.close()
+        self.label_texts = None
+
+    def new_label_texts(self, store_mode: str, sheet_name: str):
+        """
+        the empty store the next load fills, runs after close_label_texts so
+        it can't raise: a sqlite store that can't be created (no temp space,
+        disk full) falls back to memory, a file store falls back to a
+        temporary one in labelstore.create
+        """
+        headers = self.row_validator.headers
+        if store_mode != "memory":
+            try:
+                return labelstore.create(
+                    store_mode, self.label_excel_filepath, sheet_name, headers
+                )
+            except sqlite3.Error as exc:
+                print(f"Label store error {exc}")
+        return labeltable.LabelTable(headers)
+
+    def ingest_sources(self, on_finished, error_msg: str) -> None:
+        """
+        Loads every source of source_requests in a process pool (one sheet
+        per worker process) and merges them into label_texts in order, the
+        browser grows as each source is merged
+        """
+        try:
+            column_indices = exttools.get_column_indices(
+                self.header_dict,
+                self.label_info.label_data,
+                self.global_settings.show_cols,
+            )
+        except Exception as exc:
+            self.ingest_failed(exc, error_msg)
+            return
+        self.row_validator = exttools.RowValidator(
+            self.header_dict,
+            column_indices,
+            self.label_info.label_regex,
+            self.label_info.column_regex,
+        )
+        store_mode = self.global_settings.label_store
+        self.close_label_texts()
+        if store_mode != "memory":
+            store_mode = "temp"  # a merged load isn't tied to one file, never kept
+        self.label_texts = self.new_label_texts(store_mode, "")
+        self.label_sources = []
+        self.label_source_starts = []
+        self.load_browser_model(self.global_settings.show_cols.copy(), range(0))
+        self.change_button_states("loading")
+
+        self.ingest_worker = SourceIngestWorker(
+            self.source_requests,
+            {
+                "headers": self.row_validator.headers,
+                "regex": self.label_info.label_regex,
+                "column_regex": self.label_info.column_regex,
+                "backend": self.global_settings.xlsx_backend,
+                "cache_dir": self.global_settings.cache_dir,
+                "cache_size_mb": self.global_settings.cache_size_mb,
+            },
+        )
+        self.start_ingest_worker(
+            self.append_label_source,
+            lambda _, cancelled: self.finish_ingest(
+                self.row_validator.invalid_headers(), cancelled, None, on_finished
+            ),
+            error_msg,
+        )
+
+    def start_ingest_worker(self, on_chunk, on_finished, error_msg: str) -> None:
+        self.ingest_thread = QThread(self)
+        self.ingest_worker.moveToThread(self.ingest_thread)
+        self.ingest_thread.started.connect(self.ingest_worker.run)
+        self.ingest_worker.chunk_ready.connect(on_chunk)
+        self.ingest_worker.finished.connect(on_finished)
+        self.ingest_worker.failed.connect(
+            lambda exc: self.ingest_failed(exc, error_msg)
+        )
+        self.show_ingest_progress()
+        self.ingest_thread.start()
+
+    def append_label_source(self, source: dict | None) -> None:
+        if source is None:  # sheet without the chosen columns
+            return
+        self.label_sources.append((source["file"], source["sheet_name"]))
+        self.label_source_starts.append(len(self.label_texts))
+        self.label_texts.extend_columns(source["columns"], source["row_count"])
+        self.row_validator.merge_invalid(source["invalid"], source["row_count"])
+        self.set_browser_rows(range(len(self.label_texts)))
+        self.ingest_progress_bar.setFormat(
+            f"Loaded {len(self.label_texts)} labels from {len(self.label_sources)} sheets"
+        )
+
+    def append_label_rows(self, rows: list[dict[str, str]]) -> None:
+        self.label_texts.extend(rows)
+        self.set_browser_rows(range(len(self.label_texts)))
+        self.ingest_progress_bar.setFormat(f"Loaded {len(self.label_texts)} labels")
+
+    def finish_ingest(self, skip_cols, cancelled, sheet_name, on_finished) -> None:
+        self.stop_ingest_thread()
+        self.global_settings.show_cols.update({col: False for col in skip_cols})
+        (
+            self.label_info.label_data,  # get the valid, updated label data
+            self.label_info.data_not_incl,
+        ) = exttools.split_label_data(self.label_info.label_data, skip_cols)
+        if skip_cols:
+            self.load_browser_model(
+                self.global_settings.show_cols, range(len(self.label_texts))
+            )
+        if isinstance(self.label_texts, labelstore.LabelStore):
+            self.label_texts.build_indexes()
+            if not cancelled and sheet_name is not None:
+                self.label_texts.save_state(
+                    self.selected_sheet_key,
+                    self.header_dict,
+                    self.row_validator,
+                )
+        elif not cancelled and sheet_name is not None:
+            # partial loads are kept for browsing, not cached, merged loads
+            # were cached per sheet by the worker processes
+            sheetcache.save(
+                self.global_settings.cache_dir,
+                self.selected_sheet_key,
+                self.header_dict,
+                self.label_texts,
+                self.row_validator,
+                self.global_settings.cache_size_mb,
+            )
+        on_finished()
+
+    def ingest_failed(self, exc: Exception, error_msg: str) -> None:
+        self.stop_ingest_thread()
+        trace_exc = "".join(traceback.format_exception(exc))
+        print(f"Excel Error {trace_exc}")
+        error_dialog = ErrorDialog(error_msg, self)
+        ret = error_dialog.exec()
+        if ret == QDialog.Accepted:
+            info_dialog = InfoDialog(str(exc), self)
+            info_dialog.exec()
+
+    def cancel_ingest(self) -> None:
+        if self.ingest_worker is not None:
+            self.ingest_worker.cancel()
+
+    def stop_ingest_thread(self) -> None:
+        if self.ingest_thread is not None:
+            self.ingest_thread.quit()
+            self.ingest_thread.wait()
+            self.ingest_thread = None
+            self.ingest_worker = None
+        if self.ingest_progress_bar is not None:
+            self.statusBar().removeWidget(self.ingest_progress_bar)
+            self.statusBar().removeWidget(self.ingest_cancel_button)
+            self.statusBar().hide()
+            self.ingest_progress_bar = None
+            self.ingest_cancel_button = None
+        self.ui.load_labels_button.setEnabled(True)
+        if self.label_texts is not None:
+            self.change_button_states("labels")
+
+    def show_ingest_progress(self) -> None:
+        self.ingest_progress_bar = QProgressBar()
+        self.ingest_progress_bar.setRange(0, 0)  # row count unknown until done
+        self.ingest_progress_bar.setTextVisible(True)
+        self.ingest_progress_bar.setFormat("Loading labels...")
+        self.ingest_cancel_button = QPushButton("Cancel")
+        self.ingest_cancel_button.clicked.connect(self.cancel_ingest)
+        self.statusBar().addPermanentWidget(self.ingest_progress_bar)
+        self.statusBar().addPermanentWidget(self.ingest_cancel_button)
+        self.statusBar().show()
 
     def change_button_states(self, type: str) -> None:
         match type:
@@ -777,6 +1248,13 @@ class UI(QMainWindow):
                 self.ui.refresh_button.setEnabled(True)
                 self.ui.save_pdf_button.setEnabled(True)
 
+            case "loading":
+                self.ui.load_labels_button.setDisabled(True)
+                self.ui.refresh_button.setDisabled(True)
+                self.ui.settings_button.setDisabled(True)
+                self.ui.explore_button.setDisabled(True)
+                self.ui.label_browser_table.setEnabled(True)
+
     """
     Functions
     """
@@ -794,6 +1272,17 @@ class UI(QMainWindow):
         for dni in self.label_info.data_not_incl:
             self.label_info.qr_encode_bools.pop(dni)
         self.label_info.label_map = _lm_copy
+        self.compile_layout_plan()
+
+    def compile_layout_plan(self) -> None:
+        # once per accepted settings, every label then only applies the plan
+        self.layout_plan = layoutplan.compile_plan(
+            self.label_info,
+            dict(labeltools.element_mapper_factory(self.label_info.label_map)),
+        )
+        # renders of the old plan would mix layouts in one selection
+        self.label_renders.clear()
+        self.label_rasters.clear()
 
     def open_settings(self) -> None:
         self.settings_dialog = SettingsDialog(
@@ -807,7 +1296,22 @@ class UI(QMainWindow):
                 self.label_info,
                 self.global_settings,
             ) = self.settings_dialog.save_settings()
-            self.global_refresh()
+            self.compile_layout_plan()
+            try:
+                required_cols = exttools.get_column_indices(
+                    self.header_dict,
+                    self.label_info.label_data,
+                    self.global_settings.show_cols,
+                )
+            except AssertionError:
+                required_cols = None  # let global_refresh report it
+            # columns already in memory only need re-checking, not re-reading
+            if required_cols and set(required_cols) <= set(
+                self.row_validator.column_indices
+            ):
+                self.revalidate_labels()
+            else:
+                self.global_refresh()
 
     def select_searched(self, selections: list[int]) -> None:
         self.ui.label_browser_table.itemSelectionChanged.disconnect(
@@ -818,8 +1322,11 @@ class UI(QMainWindow):
             QAbstractItemView.SelectionMode.MultiSelection
         )
         for index in selections:
+            browser_row = self.get_browser_row(index - 1)
+            if browser_row is None:  # not in the current view
+                continue
             try:
-                self.ui.label_browser_table.selectRow(index - 1)
+                self.ui.label_browser_table.selectRow(browser_row)
             except Exception as _:
                 self.ui.label_browser_table.setSelectionMode(
                     QAbstractItemView.SelectionMode.ExtendedSelection
@@ -841,10 +1348,13 @@ class UI(QMainWindow):
         self.zpl_codes = []
         for i, zpl_label in enumerate(
             zpp.img_to_zpl(
-                temp_label_paths=self.temp_label_paths,
+                label_images=self.label_rasters.images(self.label_ids),
                 label_settings_mm=zpp.zpl_size_translator(
                     info=self.label_info.label_settings
                 ),
+                label_size_pix=labeltools.get_label_size(
+                    self.label_info.label_settings
+                ),
             )
         ):
             self.zpl_codes.append(zpl_label)
@@ -878,12 +1388,14 @@ class UI(QMainWindow):
             self.zpl_saver(zpl_label, zpl_path, quantities, i, browser_header_rows)
 
     def zpl_saver(self, zpl_label, zpl_path, quantities, i, browser_header_rows):
-        excel_filename = pathlib.PurePath(self.label_excel_filepath).stem
+        # named after the file and excel row the label came from
+        source_file, _, source_row = self.get_label_source(browser_header_rows[i] - 1)
+        excel_filename = pathlib.PurePath(source_file).stem
         for q in range(int(quantities[i])):
             zpl_save_path = os.path.join(
                 zpl_path,
-                f"{excel_filename}_index_{browser_header_rows[i]+1}_copy_{str(q+1)}.zpl",
-            )  # add 1 because excel header occupies row 1
+                f"{excel_filename}_index_{source_row}_copy_{str(q+1)}.zpl",
+            )
             zpp.save_zpl(zpl_label, zpl_save_path)
 
     def print_zpl(self):
@@ -902,10 +1414,13 @@ class UI(QMainWindow):
             self.zpl_codes = []
             for i, zpl_label in enumerate(
                 zpp.img_to_print(
-                    temp_label_paths=self.temp_label_paths,
+                    label_images=self.label_rasters.images(self.label_ids),
                     label_settings_mm=zpp.zpl_size_translator(
                         info=self.label_info.label_settings
                     ),
+                    label_size_pix=labeltools.get_label_size(
+                        self.label_info.label_settings
+                    ),
                 )
             ):
                 self.zpl_printer(_quantities, i, zpl_label, printer)
@@ -921,7 +1436,9 @@ class UI(QMainWindow):
             try:
                 print_tools.paint(
                     printer=printer,
-                    temp_label_paths=self.temp_label_paths,
+                    label_images=[
+                        label_qimage(self.label_rasters, i) for i in self.label_ids
+                    ],
                     resolution=self.label_info.label_settings[1],
                     label_rect=self.label_rect,
                     margins=self.label_info.margins,
@@ -936,6 +1453,80 @@ class UI(QMainWindow):
                     info_dialog.exec()
 
 
+class IngestWorker(QObject):
+    """
+    Runs exttools.stream_excel off the main thread and hands the rows back
+    in chunks, a cancel stops the stream before the next chunk
+    """
+
+    chunk_ready = Signal(object)  # list of row dicts
+    finished = Signal(object, bool)  # skip_cols, cancelled
+    failed = Signal(object)  # exception
+
+    def __init__(self, stream_kwargs: dict, chunk_size: int):
+        super().__init__()
+        self.stream_kwargs = stream_kwargs
+        self.chunk_size = chunk_size
+        self.cancelled = False
+
+    def run(self) -> None:
+        skip_cols = []
+        try:
+            row_stream = exttools.stream_excel(
+                skip_cols=skip_cols, **self.stream_kwargs
+            )
+            for rows in exttools.chunk_rows(row_stream, self.chunk_size):
+                if self.cancelled:
+                    break
+                self.chunk_ready.emit(rows)
+        except Exception as exc:
+            self.failed.emit(exc)
+            return
+        self.finished.emit(skip_cols, self.cancelled)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class SourceIngestWorker(IngestWorker):
+    """
+    Runs multiload.load_source for several sheets in a process pool, each
+    finished sheet is handed back as one chunk in the order of the sources,
+    a cancel drops the sheets that haven't started
+    """
+
+    def __init__(self, source_requests: list[tuple], load_kwargs: dict):
+        super().__init__(load_kwargs, chunk_size=1)
+        self.source_requests = source_requests
+
+    def run(self) -> None:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=multiload.pool_size(len(self.source_requests))
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        multiload.load_source,
+                        file,
+                        sheet_name,
+                        optional=optional,
+                        **self.stream_kwargs,
+                    )
+                    for file, sheet_name, optional in self.source_requests
+                ]
+                for future in futures:
+                    while not (self.cancelled or future.done()):
+                        wait([future], timeout=0.1)
+                    if self.cancelled:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+                    self.chunk_ready.emit(future.result())
+        except Exception as exc:
+            self.failed.emit(exc)
+            return
+        self.finished.emit([], self.cancelled)
+
+
 class PrintDialog(QPrintDialog):
     def __init__(self, printer, parent):
         super().__init__(printer, parent)
@@ -956,6 +1547,20 @@ class PrintDialog(QPrintDialog):
         )
 
 
+def label_qimage(label_rasters, row_id: int) -> QImage:
+    """
+    QImage of a stored label, straight from its pixel buffer, Format_Mono
+    for 1-bit labels and Format_Grayscale8 otherwise
+    """
+    mode, (width, height), data = label_rasters.buffer(row_id)
+    bytes_per_line = label_rasters.bytes_per_line(row_id)
+    if mode == "1":
+        label_image = QImage(data, width, height, bytes_per_line, QImage.Format_Mono)
+        label_image.setColorTable([QColor(Qt.black).rgb(), QColor(Qt.white).rgb()])
+        return label_image
+    return QImage(data, width, height, bytes_per_line, QImage.Format_Grayscale8)
+
+
 class PrintTools:
     def create_printer(self, label_settings, rotated=True):
         self.rotated = rotated
@@ -983,7 +1588,7 @@ class PrintTools:
 
         return printer
 
-    def paint(self, printer, temp_label_paths, resolution, label_rect, margins):
+    def paint(self, printer, label_images, resolution, label_rect, margins):
         assert resolution == printer.resolution(), (
             f"Resolution is different from printer settings.\n"
             f"Current printer settings: \t{printer.resolution()}DPI\n"
@@ -991,8 +1596,7 @@ class PrintTools:
             f"Please set your label and printer settings to the same DPI"
         )
         painter = QPainter(printer)
-        for label_path in temp_label_paths:
-            label_image = QImage(label_path)
+        for i, label_image in enumerate(label_images):
             if self.rotated:
                 label_rect = QRect(
                     0, margins[0], label_rect.height(), label_rect.width()
@@ -1004,7 +1608,7 @@ class PrintTools:
                     transform.rotate(90.0), mode=Qt.SmoothTransformation
                 )
             painter.drawImage(label_rect, label_image)
-            if temp_label_paths.index(label_path) < len(temp_label_paths) - 1:
+            if i < len(label_images) - 1:
                 printer.newPage()
         painter.end()
 
@@ -1064,10 +1668,10 @@ class PreviewDisplay(QGraphicsScene):
         self.margin = 20
 
     def load_scene(
-        self, temp_label_array: list[object], label_size_pix: tuple[int, int]
+        self, label_images: list[object], label_size_pix: tuple[int, int]
     ) -> tuple[list[object], object, object]:
         """
-        Takes in the array of temp_label locations,
+        Takes in the array of label QImages,
         clears previous scene,
         creates a rect for each based on label size and
         appends them to the current scene, also returns
@@ -1076,14 +1680,14 @@ class PreviewDisplay(QGraphicsScene):
         if self._current_rects:
             self.clear()
 
-        for i, temp_label in enumerate(temp_label_array):
+        for i, label_image in enumerate(label_images):
             # create new rects first using current selection
             x, y = (
                 self._new_rects[i].bottomLeft().x(),
                 self._new_rects[i].bottomLeft().y() + self.margin,
             )
             self._add_rects(label_size_pix, x, y)
-            self._add_to_scene(temp_label, x, y)
+            self._add_to_scene(label_image, x, y)
 
         # compare and update any added or removed rects
         rects_to_update = self._update_rects()
@@ -1100,11 +1704,11 @@ class PreviewDisplay(QGraphicsScene):
                 None,
             )
 
-    def _add_to_scene(self, temp_label: object, x: int, y: int) -> None:
+    def _add_to_scene(self, label_image: object, x: int, y: int) -> None:
         # TODO: utilise the QPixmap's cache ability to reduce redrawing images
-        temp_label_pixmap = QPixmap(temp_label)  # use QPixmap for cache ability
-        pix_pointer = self.addPixmap(temp_label_pixmap)
-        # print(f"Setting {temp_label} pixmap to pos {x},{y}")
+        label_pixmap = QPixmap.fromImage(label_image)  # use QPixmap for cache ability
+        pix_pointer = self.addPixmap(label_pixmap)
+        # print(f"Setting label pixmap to pos {x},{y}")
         pix_pointer.setPos(x, y)
 
     def _add_rects(self, label_size_pix: tuple[int, int], x: int, y: int) -> object:
@@ -1536,6 +2140,11 @@ class SettingsDialog(DialogDataTools):
         self.resolutions = ["144", "203", "300"]
         self.languages = ["English", "แบบไทย"]
         self.units = ["Inches", "Pixels", "mm"]
+        self.label_stores = {
+            "memory": "Memory",
+            "temp": "Temporary database",
+            "file": "Database next to the file",  # reused while it is unchanged
+        }
         self.load_fields()
         self.match_label_data_count()
         self.set_radios(self.label_info.alignment, self.label_info.label_map)
@@ -1567,6 +2176,11 @@ class SettingsDialog(DialogDataTools):
             self.label_info.label_settings,
         )
         self.load_checkboxes(self.label_info.show_titles)
+        self.ui.label_store_combobox.addItems(self.label_stores.values())
+        self.ui.label_store_combobox.setCurrentIndex(
+            list(self.label_stores).index(self.global_settings.label_store)
+        )
+        self.ui.bilevel_checkbox.setChecked(self.global_settings.bilevel)
         self.load_show_list(self.header_dict, self.global_settings.show_cols)
         self.load_label_list(
             self.header_dict,
@@ -1735,36 +2349,36 @@ class SettingsDialog(DialogDataTools):
 
     def permitted_check(self, item: object):
         state = item.checkState()
+        char = item.text().lower()
         if state == Qt.CheckState.Checked:
-            if item.text() not in self.label_info.allowed_chars:
-                self.label_info.allowed_chars.append(item.text())
+            if char not in self.label_info.allowed_chars:
+                self.label_info.allowed_chars.append(char)
+                self.label_info.unallowed_chars.remove(char)
         if state == Qt.CheckState.Unchecked:
-            if item.text() in self.label_info.allowed_chars:
-                self.label_info.allowed_chars.remove(item.text())
-        self.construct_regex(self.label_info.allowed_chars, self.label_info.label_regex)
-
-    def construct_regex(self, pattern_dict: dict[str, bool], current_regex: str):
-        regex_pattern = current_regex
-
-        if pattern_dict.get("alphabets") and "[a-zA-Z]" not in regex_pattern:
-            regex_pattern += "[a-zA-Z]"
-
-        if pattern_dict.get("numbers") and "\\d" not in regex_pattern:
-            regex_pattern += "\\d"
-
-        if pattern_dict.get("dashes") and "-" not in regex_pattern:
-            regex_pattern += "-"
-
-        if pattern_dict.get("spaces") and "\\s" not in regex_pattern:
-            regex_pattern += "\\s"
-
-        if pattern_dict.get("brackets") and "[\\[\\]]" not in regex_pattern:
-            regex_pattern += "[\\[\\]]"
-
-        if pattern_dict.get("colons") and ":" not in regex_pattern:
-            regex_pattern += ":"
+            if char in self.label_info.allowed_chars:
+                self.label_info.allowed_chars.remove(char)
+                self.label_info.unallowed_chars.append(char)
+        self.label_info.label_regex = self.construct_regex(
+            self.label_info.allowed_chars
+        )
 
-        return regex_pattern
+    def construct_regex(self, allowed_chars: list[str]) -> str:
+        char_classes = {
+            "alphabets": "a-zA-Z",
+            "numbers": "0-9",
+            "dashes": "\\-",
+            "spaces": "\\s",
+            "brackets": "\\[\\]",
+            "colons": ":",
+        }
+        regex_pattern = "".join(
+            char_class
+            for char, char_class in char_classes.items()
+            if char in allowed_chars
+        )
+        if not regex_pattern:
+            return "^$"
+        return f"^[{regex_pattern}]{{1,}}$"
 
     def save_settings(self):
         self.check_label_map()
@@ -1772,6 +2386,11 @@ class SettingsDialog(DialogDataTools):
         self.global_settings.show_cols = self.sort_show_cols(
             self.header_dict, self.global_settings.show_cols
         )
+        # takes effect from the next load
+        self.global_settings.label_store = list(self.label_stores)[
+            self.ui.label_store_combobox.currentIndex()
+        ]
+        self.global_settings.bilevel = self.ui.bilevel_checkbox.isChecked()
         return self.label_info, self.global_settings
 
 
@@ -1779,16 +2398,15 @@ class ExcelDialog(DialogDataTools):
     def __init__(
         self,
         filepath,
-        use_xls,
-        xl_worksheets,
-        xl_worksheet_names,
+        sheet_readers,
         label_info,
         global_settings,
+        file_count=1,
         parent=None,
     ):
         super().__init__(parent=parent)
-        self.use_xls = use_xls
-        self.xl_worksheets = xl_worksheets
+        self.sheet_readers = sheet_readers
+        self.xl_worksheet_names = [reader.name for reader in sheet_readers]
         self.label_info = label_info
         self.label_info.reset_label_data()  # dont reset settings like dpi, size etc.
         self.global_settings = global_settings
@@ -1796,7 +2414,14 @@ class ExcelDialog(DialogDataTools):
         self.ui = Ui_ExcelDialog()
         self.ui.setupUi(self)
         self.ui.file_chosen_label.setText(os.path.basename(filepath))
-        self.ui.select_worksheet_combobox.addItems(xl_worksheet_names)
+        if file_count > 1:
+            self.ui.file_chosen_label.setText(
+                f"{os.path.basename(filepath)} (+{file_count - 1} more)"
+            )
+            self.ui.all_sheets_checkbox.setText(
+                "Load all sheets with these columns, of every file"
+            )
+        self.ui.select_worksheet_combobox.addItems(self.xl_worksheet_names)
         self.ui.select_worksheet_combobox.setCurrentIndex(0)
         self.load_headers(0)  # must occur
         self.ui.select_worksheet_combobox.currentIndexChanged.connect(self.load_headers)
@@ -1808,7 +2433,7 @@ class ExcelDialog(DialogDataTools):
         self.ui.size_combobox.currentIndexChanged.connect(self.size_check)
 
     def load_headers(self, i: int):
-        self.header_dict = exttools.get_headers(self.xl_worksheets[i], self.use_xls)
+        self.header_dict = exttools.get_headers(self.sheet_readers[i])
         self.ui.show_columns_list.clear()
         self.ui.label_data_list.clear()
         self.ui.qr_data_list.clear()
@@ -1838,7 +2463,7 @@ class ExcelDialog(DialogDataTools):
             self.header_dict, self.global_settings.show_cols
         )
         return (
-            self.xl_worksheets[xl_index],
+            self.xl_worksheet_names[xl_index],
             self.header_dict,
             self.label_info,
             self.global_settings,
@@ -1860,7 +2485,7 @@ class ExploreDialog(QDialog):
         self.ui.category_list.currentTextChanged.connect(self.detect_options)
 
     def load_categories(self):
-        for header in self.label_texts[0].keys():
+        for header in self.label_texts.headers:
             item = QListWidgetItem(str(header))
             self.ui.category_list.addItem(item)
 
@@ -1868,10 +2493,7 @@ class ExploreDialog(QDialog):
         self.cat = cat
         self.ui.detected_list.clearSelection()
         self.ui.detected_list.clear()
-        option_candidates = [
-            label_row_dict.get(cat) for label_row_dict in self.label_texts
-        ]
-        options = list(set(option_candidates))
+        options = self.label_texts.distinct(cat)
         for o in options:
             item = QListWidgetItem(str(o))
             self.ui.detected_list.addItem(item)
@@ -1881,12 +2503,7 @@ class ExploreDialog(QDialog):
         if selected_item is None:
             return
         selected_option = selected_item.text()
-        option_rows = [
-            label_row_dict
-            for label_row_dict in self.label_texts
-            if label_row_dict.get(self.cat) == selected_option
-        ]
-        self.view_fn(option_rows)
+        self.view_fn(self.label_texts.where(self.cat, selected_option))
 
 
 class ConfirmDialog(QDialog):
@@ -1977,6 +2594,7 @@ class LabelInfo:
         self.font_name = "OCRB_Regular"
         self.title_font_name = "OCRA_Bold"
         self.label_regex = r"^[a-zA-Z0-9\-]{1,}$"
+        self.column_regex = {}  # {header: regex}, overrides label_regex
         self.module_size = None
         self.show_titles = False
         self.label_map = {
@@ -2146,6 +2764,12 @@ class GlobalSettings:
         self.language = "English"
         self.theme = "dark"
         self.show_cols = {}
+        self.xlsx_backend = "native"  # or "openpyxl"
+        self.cache_dir = sheetcache.default_cache_dir()  # None to disable
+        self.cache_size_mb = 512
+        # "memory", or a sqlite label store: "temp" or "file" (next to the excel)
+        self.label_store = "memory"
+        self.bilevel = False  # 1-bit labels end to end, for thermal printers
 
     def reset_cols(self):
         self.show_cols = {}
@@ -60,6 +60,12 @@ class Ui_ExcelDialog(object):
 
         self.formLayout.setWidget(1, QFormLayout.FieldRole, self.select_worksheet_combobox)
 
+        self.all_sheets_checkbox = QCheckBox(ExcelDialog)
+        self.all_sheets_checkbox.setObjectName(u"all_sheets_checkbox")
+        self.all_sheets_checkbox.setFont(font1)
+
+        self.formLayout.setWidget(2, QFormLayout.FieldRole, self.all_sheets_checkbox)
+
         self.show_columns_label = QLabel(ExcelDialog)
         self.show_columns_label.setObjectName(u"show_columns_label")
         self.show_columns_label.setFont(font1)
@@ -244,6 +250,7 @@ class Ui_ExcelDialog(object):
         self.filename_label.setText(QCoreApplication.translate("ExcelDialog", u"Filename", None))
         self.file_chosen_label.setText(QCoreApplication.translate("ExcelDialog", u"-", None))
         self.select_worksheet_label.setText(QCoreApplication.translate("ExcelDialog", u"Select Worksheet", None))
+        self.all_sheets_checkbox.setText(QCoreApplication.translate("ExcelDialog", u"Load all sheets with these columns", None))
         self.show_columns_label.setText(QCoreApplication.translate("ExcelDialog", u"Show columns", None))
         self.label_size_label.setText(QCoreApplication.translate("ExcelDialog", u"Label Size (Height x Width)", None))
         self.wxh_label.setText(QCoreApplication.translate("ExcelDialog", u"(Width x Height)", None))
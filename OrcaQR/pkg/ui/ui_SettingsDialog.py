@@ -327,6 +327,29 @@ class Ui_SettingsDialog(object):
 
         self.formLayout_2.setWidget(3, QFormLayout.FieldRole, self.show_columns_list)
 
+        self.label_store_label = QLabel(self.general_settings_group)
+        self.label_store_label.setObjectName(u"label_store_label")
+        self.label_store_label.setFont(font1)
+
+        self.formLayout_2.setWidget(4, QFormLayout.LabelRole, self.label_store_label)
+
+        self.label_store_combobox = QComboBox(self.general_settings_group)
+        self.label_store_combobox.setObjectName(u"label_store_combobox")
+        self.label_store_combobox.setFont(font)
+
+        self.formLayout_2.setWidget(4, QFormLayout.FieldRole, self.label_store_combobox)
+
+        self.bilevel_label = QLabel(self.general_settings_group)
+        self.bilevel_label.setObjectName(u"bilevel_label")
+        self.bilevel_label.setFont(font1)
+
+        self.formLayout_2.setWidget(5, QFormLayout.LabelRole, self.bilevel_label)
+
+        self.bilevel_checkbox = QCheckBox(self.general_settings_group)
+        self.bilevel_checkbox.setObjectName(u"bilevel_checkbox")
+
+        self.formLayout_2.setWidget(5, QFormLayout.FieldRole, self.bilevel_checkbox)
+
 
         self.gridLayout_4.addWidget(self.general_settings_group, 0, 0, 1, 1)
 
@@ -383,6 +406,9 @@ class Ui_SettingsDialog(object):
         self.working_dir_label.setText(QCoreApplication.translate("SettingsDialog", u"Working Directory", None))
         self.search_dir_button.setText(QCoreApplication.translate("SettingsDialog", u"Choose Folder", None))
         self.show_columns_label.setText(QCoreApplication.translate("SettingsDialog", u"Show Columns", None))
+        self.label_store_label.setText(QCoreApplication.translate("SettingsDialog", u"Label Store", None))
+        self.bilevel_label.setText(QCoreApplication.translate("SettingsDialog", u"1-bit Labels", None))
+        self.bilevel_checkbox.setText(QCoreApplication.translate("SettingsDialog", u"For thermal printers", None))
         self.copyright_label.setText(QCoreApplication.translate("SettingsDialog", u"\u00a9 2023 Fling Asia ", None))
     # retranslateUi
 
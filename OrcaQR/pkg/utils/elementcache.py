@@ -0,0 +1,88 @@
+"""
+In-memory cache of generated label elements, shared across labels
+
+Rows often share field values (same SKU, location prefix or batch) and an
+element with the same type, text, size and font comes out the same on
+every label, so it is generated and rasterized once and reused
+
+Entries are evicted least recently used first once their estimated size
+goes over the memory budget, hits and misses are counted to tune it
+
+DEFINITIONS:
+ - key: tuple of everything an element depends on, e.g.
+   ("unpack_text_map", text, font, label_width), the dpi is already in
+   the pixel sizes and alignment is applied after the cache
+"""
+
+from collections import OrderedDict
+
+from PIL import Image
+
+ENTRY_BYTES = 512  # rough size of an entry besides its images
+
+
+def image_bytes(image: Image.Image) -> int:
+    width, height = image.size
+    if image.mode == "1":
+        return (width + 7) // 8 * height  # 8 pixels a byte
+    return width * height * len(image.getbands())
+
+
+def entry_bytes(value) -> int:
+    parts = value if isinstance(value, tuple) else (value,)
+    return ENTRY_BYTES + sum(
+        image_bytes(part) for part in parts if isinstance(part, Image.Image)
+    )
+
+
+class ElementCache:
+    def __init__(self, budget_mb: int):
+        self.budget = budget_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, estimated bytes)
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple, make: object):
+        """
+        the value cached under key, make() builds it on a miss, values are
+        shared so callers must not modify them
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        value = make()
+        nbytes = entry_bytes(value)
+        self._entries[key] = (value, nbytes)
+        self._bytes += nbytes
+        self._evict()
+        return value
+
+    def _evict(self) -> None:
+        # the newest entry always stays, even if it alone is over budget
+        while self._bytes > self.budget and len(self._entries) > 1:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+
+    def resize(self, budget_mb: int) -> None:
+        self.budget = budget_mb * 1024 * 1024
+        self._evict()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,107 +1,211 @@
+import functools
 import os
 import re
-import xlrd
 from openpyxl import load_workbook
 from openpyxl.utils.cell import coordinate_from_string
 
 
-def get_worksheets(file: str, use_xls: bool) -> str:
-    if not use_xls:
-        xl = load_workbook(file, data_only=True)
-        return xl.worksheets, xl.sheetnames
-    else:
-        xl = xlrd.open_workbook(file)
-        return xl.sheets(), xl.sheet_names()
-
-
-def get_headers(sheet: object, use_xls: bool) -> dict:
-    header_row = sheet[1] if not use_xls else sheet.row(0)
-    first_index = 1 if not use_xls else 0
+def get_headers(reader: object) -> dict:
     header_dict = {
-        header.value: column_index
-        for column_index, header in enumerate(header_row, first_index)
-        if header.value is not None
+        header: column_index
+        for column_index, header in enumerate(reader.header_row(), reader.first_index)
+        if header is not None
     }
     return header_dict
 
 
-def read_excel(
-    use_xls: bool,
-    sheet: object,
-    header_dict: dict,
-    regex: str,
-    label_data: list,
-    show_cols: dict,
-) -> list[list[str]]:
-    skip_cols = []
-    assert label_data is not None, "No label data specified"
-    column_indices = [
+def get_column_indices(header_dict: dict, label_data: list, show_cols: dict) -> list:
+    column_indices = {
         header_dict.get(column_name)
         for column_name, show_bool in show_cols.items()
         if show_bool
-    ]
-    column_indices.extend([header_dict.get(data) for data in label_data])
-    column_indices.sort()
+    }
+    column_indices.update([header_dict.get(data) for data in label_data])
+    column_indices = sorted(column_indices)
 
     if not column_indices:
         raise AssertionError(
             "No columns are matched to show, check Settings: Columns to show,\n Caution, values are case sensitive"
         )
-    all_row_vals = []
-    if not use_xls:
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            sel_col_val = {}
-            for col_index in column_indices:
-                cell_value = row[col_index - 1]
-                if isinstance(cell_value, float):
-                    cell_value = int(cell_value)
-                if not re.match(re.compile(regex), str(cell_value)):
-                    skip_col = list(header_dict.keys())[
-                        list(header_dict.values()).index(col_index)
-                    ]
-                    if skip_col not in skip_cols:
-                        skip_cols.append(str(skip_col))
-                    show_cols.update({skip_col: False})
-                    continue
-                sel_col_val.update(
-                    {
-                        list(header_dict.keys())[
-                            list(header_dict.values()).index(col_index)
-                        ]: str(cell_value)
-                    }
-                )
-
-            all_row_vals.append(sel_col_val)
-    else:
-        for row_index in range(1, sheet.nrows):  # Start from row 2
-            row = sheet.row(row_index)
-            sel_col_val = []
-            for col_index in column_indices:
-                cell_value = row[col_index].value
-                if isinstance(cell_value, float):
-                    cell_value = int(cell_value)
-                if not re.match(re.compile(regex), str(cell_value)):
-                    skip_col = list(header_dict.keys())[
-                        list(header_dict.values()).index(col_index)
-                    ]
-                    if skip_col not in skip_cols:
-                        skip_cols.append(str(skip_col))
-                    show_cols.update({skip_col: False})
-                    continue
-                sel_col_val.update(
-                    {
-                        list(header_dict.keys())[
-                            list(header_dict.values()).index(col_index)
-                        ]: str(cell_value)
-                    }
-                )
-            all_row_vals.append(sel_col_val)
-
+    return column_indices
+
+
+class RowValidator:
+    """
+    Built once per load, holds everything read_excel needs per cell:
+    a compiled pattern per column, the column index -> header table
+    and a bitmap of invalid cells per column (bit n = data row n)
+
+    Loaded rows keep their invalid values, so a changed regex only
+    re-checks the columns whose pattern changed, without re-reading the file
+    """
+
+    def __init__(
+        self,
+        header_dict: dict,
+        column_indices: list,
+        regex: str,
+        column_regex: dict = None,
+    ):
+        index_header = {index: header for header, index in header_dict.items()}
+        self.headers = [index_header[i] for i in column_indices]
+        self.column_indices = column_indices
+        self.regex = {}
+        self.columns = []  # [(col index, header, pattern.match)]
+        self.invalid = {header: bytearray() for header in self.headers}
+        self.row_count = 0
+        self.update_patterns(regex, column_regex)
+
+    @classmethod
+    def from_state(cls, header_dict: dict, state: dict) -> "RowValidator":
+        """
+        rebuilds a validator from a sheetcache entry, the cached patterns are
+        kept so update_patterns reports which columns need re-checking
+        """
+        validator = cls(header_dict, state["column_indices"], "", state["regex"])
+        validator.invalid = state["invalid"]
+        validator.row_count = state["row_count"]
+        return validator
+
+    def update_patterns(self, regex: str, column_regex: dict = None) -> list:
+        """
+        returns the headers whose pattern changed and need re-checking
+        """
+        column_regex = column_regex or {}
+        changed = []
+        self.columns = []
+        for col_index, header in zip(self.column_indices, self.headers):
+            _regex = column_regex.get(header, regex)
+            if self.regex.get(header) != _regex:
+                changed.append(header)
+                self.regex[header] = _regex
+            self.columns.append((col_index, header, re.compile(_regex).match))
+        return changed
+
+    def mark(self, header: str, row: int) -> None:
+        bitmap = self.invalid[header]
+        byte = row >> 3
+        if byte >= len(bitmap):
+            bitmap.extend(bytes(byte + 1 - len(bitmap)))
+        bitmap[byte] |= 1 << (row & 7)
+
+    def is_invalid(self, header: str, row: int) -> bool:
+        bitmap = self.invalid.get(header)
+        if not bitmap or (row >> 3) >= len(bitmap):
+            return False
+        return bool(bitmap[row >> 3] & (1 << (row & 7)))
+
+    def invalid_headers(self) -> list:
+        return [header for header in self.headers if any(self.invalid[header])]
+
+    def merge_invalid(self, invalid: dict, row_count: int) -> None:
+        """
+        appends the invalid bitmaps of another validator's rows after
+        this one's, used when several sheets are merged into one table
+        """
+        offset = self.row_count
+        for header, bitmap in invalid.items():
+            if header not in self.invalid:
+                continue
+            for byte_index, byte in enumerate(bitmap):
+                for bit in range(8) if byte else ():
+                    if byte >> bit & 1:
+                        self.mark(header, offset + byte_index * 8 + bit)
+        self.row_count += row_count
+
+    def recheck(self, label_table: object, headers: list) -> None:
+        # re-validates stored values of the given columns only
+        matches = {h: match for _, h, match in self.columns if h in headers}
+        for header, match in matches.items():
+            self.invalid[header] = bytearray()
+            for row_index, value in enumerate(label_table.column(header)):
+                if not match(value):
+                    self.mark(header, row_index)
+
+
+def stream_excel(
+    reader: object,
+    header_dict: dict,
+    regex: str,
+    label_data: list,
+    show_cols: dict,
+    skip_cols: list,
+    validator: RowValidator = None,
+    column_regex: dict = None,
+):
+    """
+    generator version of read_excel, yields one row dict at a time
+    so the sheet never has to be held in memory as a whole
+
+    reader: any rowreaders reader, every backend goes through the same
+    validation loop below
+
+    invalid columns are appended to skip_cols and hidden in show_cols as they
+    are found, so both are only complete once the generator is exhausted,
+    the invalid cells themselves are recorded in the validator
+    """
+    assert label_data is not None, "No label data specified"
+    if validator is None:
+        column_indices = get_column_indices(header_dict, label_data, show_cols)
+        validator = RowValidator(header_dict, column_indices, regex, column_regex)
+    rows = reader.iter_rows(validator.column_indices)
+    first_index = reader.first_index
+
+    columns = [
+        (col_index - first_index, header, match)
+        for col_index, header, match in validator.columns
+    ]
+    for row_index, row in enumerate(rows, validator.row_count):
+        row_len = len(row)
+        sel_col_val = {}
+        for col_index, header, match in columns:
+            # read-only rows are not padded past the last filled cell
+            cell_value = row[col_index] if col_index < row_len else None
+            if isinstance(cell_value, float):
+                cell_value = int(cell_value)
+            cell_value = str(cell_value)
+            if not match(cell_value):
+                validator.mark(header, row_index)
+                if header not in skip_cols:
+                    skip_cols.append(str(header))
+                show_cols.update({header: False})
+            sel_col_val[header] = cell_value
+        validator.row_count = row_index + 1
+        yield sel_col_val
+
+
+def split_label_data(label_data: list, skip_cols: list) -> tuple[list, set]:
     skip_set = set(skip_cols)
     _ic = [x for x in label_data if x not in skip_set]
     data_not_incl = [x for x in label_data if x in skip_set]
     data_not_incl = set(data_not_incl)
     label_data = _ic[:]  # remove all invalid columns from label data
+    return label_data, data_not_incl
+
+
+def chunk_rows(rows, chunk_size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_excel(
+    reader: object,
+    header_dict: dict,
+    regex: str,
+    label_data: list,
+    show_cols: dict,
+) -> list[list[str]]:
+    skip_cols = []
+    all_row_vals = list(
+        stream_excel(reader, header_dict, regex, label_data, show_cols, skip_cols)
+    )
+    label_data, data_not_incl = split_label_data(label_data, skip_cols)
     return all_row_vals, label_data, data_not_incl, show_cols
 
 
@@ -115,6 +219,7 @@ def get_icon_path(icon_name: str) -> str:
     return os.path.join(base_path, "resources", "icons", f"{icon_name}.jpg")
 
 
+@functools.cache
 def get_font_path(font_name: str) -> str:
     base_path = os.path.abspath(".")
     return os.path.join(base_path, "resources", "fonts", f"{font_name}.ttf")
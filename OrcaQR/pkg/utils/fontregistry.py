@@ -0,0 +1,92 @@
+"""
+Process-wide font cache for label text
+
+Each font file under resources/fonts is read from disk once and its bytes
+are shared by every size made from it, sized FreeType objects are kept
+per (font, size) and evicted least recently used first
+
+Text widths for sizing come from a per-font table of glyph advances and
+kerning pairs measured at REFERENCE_SIZE, widths scale with the font size
+so the size for a target width is solved directly instead of searched
+
+DEFINITIONS:
+ - font_path: path of a .ttf, as given by exttools.get_font_path
+ - advance: width a character moves the pen at REFERENCE_SIZE
+ - kerning: adjustment of a character pair on top of their two advances,
+   as applied by pillow's layout, 0 for most pairs
+"""
+
+import functools
+import io
+
+from PIL import ImageFont
+
+FONT_CACHE_SIZE = 256  # sized fonts kept, a layout uses a handful of sizes per font
+REFERENCE_SIZE = 100
+
+
+@functools.cache
+def font_data(font_path: str) -> bytes:
+    with open(font_path, "rb") as font_file:
+        return font_file.read()
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    # BytesIO hands its whole buffer to pillow without copying it
+    return ImageFont.truetype(io.BytesIO(font_data(font_path)), size)
+
+
+@functools.cache
+def glyph_metrics(font_path: str) -> tuple[dict[str, float], dict[str, float]]:
+    """
+    (advances, kerning) of a font, both filled in as new characters and
+    pairs are met, so each is measured once per process
+    """
+    return {}, {}
+
+
+def text_length(font_path: str, text: str) -> float:
+    # width of text at REFERENCE_SIZE, O(len(text)) dict lookups once warm
+    advances, kerning = glyph_metrics(font_path)
+    font = None
+    length = 0.0
+    for i, char in enumerate(text):
+        if char not in advances:
+            font = font or get_font(font_path, REFERENCE_SIZE)
+            advances[char] = font.getlength(char)
+        length += advances[char]
+        if i:
+            pair = text[i - 1 : i + 1]
+            if pair not in kerning:
+                font = font or get_font(font_path, REFERENCE_SIZE)
+                kerning[pair] = (
+                    font.getlength(pair) - advances[pair[0]] - advances[char]
+                )
+            length += kerning[pair]
+    return length
+
+
+def fit_font_size(font_path: str, text: str, max_length: float) -> int:
+    """
+    largest size at which text is narrower than max_length, solved from the
+    reference width, then checked once against the real font since hinting
+    rounds every glyph's advance at small sizes
+    """
+    length = text_length(font_path, text)
+    if length <= 0:
+        return 1
+    size = max(1, int(max_length * REFERENCE_SIZE / length))
+    sized_length = get_font(font_path, size).getlength(text)
+    if sized_length >= max_length:
+        # each glyph's advance is rounded to the pixel at its size, leave
+        # room for that so the corrected size needs no second check
+        slack = max_length - len(text) / 2 - 1
+        size = max(1, int(size * slack / sized_length))
+    return size
+
+
+def clear() -> None:
+    glyph_metrics.cache_clear()
+    get_font.cache_clear()
+    font_data.cache_clear()
@@ -0,0 +1,335 @@
+"""
+SQLite backed alternative to LabelTable for very large manifests
+
+Rows live in a sqlite database instead of memory, either a temporary one
+that is dropped with the store or a file next to the excel file that is
+reused while the file is unchanged (same rules as sheetcache)
+
+LabelStore offers the same methods as LabelTable, so the browser, explore
+and search code don't care which one they get, the lookups are queries:
+ - where / distinct: an index per column
+ - search / match: an fts5 trigram index over every column, if the sqlite
+   build lacks fts5 the columns are scanned with LIKE instead
+
+DEFINITIONS:
+ - idx: the row index, same as LabelTable's, 0 is the first row under the headers
+ - cN: column of the Nth header, headers themselves are never used as sql names
+"""
+
+import marshal
+import os
+import re
+import sqlite3
+from array import array
+
+from .labeltable import LabelRow, hash_values
+from .sheetcache import cache_key
+
+SUFFIX = ".labels.db"
+HASH_OFFSET = 1 << 63  # row hashes are unsigned, sqlite integers signed
+ROW_CACHE_SIZE = 4096
+QUERY_CHUNK = 500  # stays under sqlite's bound variable limit
+
+
+def store_path(file: str, sheet_name: str) -> str:
+    # next to the excel file, characters windows won't take are replaced
+    sheet_name = re.sub(r'[<>:"/\\|?*]', "_", str(sheet_name))
+    return f"{file}.{sheet_name}{SUFFIX}"
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class LabelStore:
+    def __init__(self, path: str, headers: list[str]):
+        # path "" gives a private temporary database, deleted on close
+        self.path = path
+        self.headers = list(headers)
+        self._columns = {h: f"c{i}" for i, h in enumerate(self.headers)}
+        self._positions = {h: i for i, h in enumerate(self.headers)}
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=OFF")  # rebuilt from excel if lost
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._rows = {}  # idx -> row values, bounded by ROW_CACHE_SIZE
+        self._length = None
+        self.fts = False
+
+    @classmethod
+    def create(cls, path: str, headers: list[str]) -> "LabelStore":
+        store = cls(path, headers)
+        columns = ", ".join(f"{c} TEXT" for c in store._columns.values())
+        try:
+            with store._db:
+                store._db.execute("DROP TABLE IF EXISTS labels")
+                store._db.execute("DROP TABLE IF EXISTS labels_fts")
+                store._db.execute("DROP TABLE IF EXISTS meta")
+                store._db.execute(
+                    f"CREATE TABLE labels (idx INTEGER PRIMARY KEY, hash INTEGER, {columns})"
+                )
+                store._db.execute("CREATE TABLE meta (state BLOB)")
+        except sqlite3.Error:
+            store.close()
+            raise
+        store._length = 0
+        return store
+
+    def build_indexes(self) -> None:
+        """
+        called once the rows are in, building indexes after the inserts
+        is a lot quicker than keeping them up to date on every chunk
+        """
+        columns = list(self._columns.values())
+        with self._db:
+            for column in columns:
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS labels_{column} ON labels ({column})"
+                )
+            try:
+                self._db.execute(
+                    f"CREATE VIRTUAL TABLE labels_fts USING fts5({', '.join(columns)},"
+                    " content='labels', content_rowid='idx', tokenize='trigram')"
+                )
+                self._db.execute("INSERT INTO labels_fts(labels_fts) VALUES('rebuild')")
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False  # no fts5 or no trigram tokenizer
+
+    def save_state(self, key: tuple, header_dict: dict, validator: object) -> None:
+        # key: sheetcache.cache_key taken before the rows were read
+        state = {
+            "key": key,
+            "header_dict": list(header_dict.items()),
+            "headers": self.headers,
+            "column_indices": validator.column_indices,
+            "regex": list(validator.regex.items()),
+            "invalid": [bytes(validator.invalid[h]) for h in self.headers],
+            "row_count": len(self),
+            "fts": self.fts,
+        }
+        with self._db:
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("INSERT INTO meta VALUES (?)", (marshal.dumps(state),))
+
+    def _invalidate_state(self) -> None:
+        # edited rows no longer match the excel file, don't reuse this store
+        with self._db:
+            self._db.execute("DELETE FROM meta")
+
+    def __len__(self) -> int:
+        if self._length is None:
+            (self._length,) = self._db.execute("SELECT COUNT(*) FROM labels").fetchone()
+        return self._length
+
+    def __getitem__(self, index: int) -> LabelRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("label row index out of range")
+        return LabelRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield LabelRow(self, index)
+
+    def append(self, row: dict[str, str]) -> None:
+        self.extend([row])
+
+    def extend(self, rows: list[dict[str, str]]) -> None:
+        start = len(self)
+        records = []
+        for idx, row in enumerate(rows, start):
+            values = [row.get(h, "") for h in self.headers]
+            records.append((idx, hash_values(values) - HASH_OFFSET, *values))
+        marks = ", ".join("?" * (len(self.headers) + 2))
+        with self._db:
+            self._db.executemany(f"INSERT INTO labels VALUES ({marks})", records)
+        self._length = start + len(records)
+
+    def extend_columns(
+        self, columns: dict[str, tuple[list[str], array]], row_count: int
+    ) -> None:
+        # LabelTable.columns() of another table, e.g. from a worker process
+        decoded = []
+        for header in self.headers:
+            values, codes = columns.get(header, ([""], array("I", [0]) * row_count))
+            decoded.append([values[code] for code in codes])  # values is rebound next
+        self.extend(dict(zip(self.headers, row)) for row in zip(*decoded))
+
+    def _fetch(self, indexes) -> None:
+        missing = [i for i in indexes if i not in self._rows]
+        if len(self._rows) + len(missing) > ROW_CACHE_SIZE:
+            self._rows.clear()
+        columns = ", ".join(self._columns.values())
+        for chunk_start in range(0, len(missing), QUERY_CHUNK):
+            chunk = missing[chunk_start : chunk_start + QUERY_CHUNK]
+            query = (
+                f"SELECT idx, {columns} FROM labels"
+                f" WHERE idx IN ({', '.join('?' * len(chunk))})"
+            )
+            for idx, *values in self._db.execute(query, chunk):
+                self._rows[idx] = values
+
+    def get(self, index: int, header: str) -> str:
+        if index not in self._rows:
+            self._fetch([index])
+        return self._rows[index][self._positions[header]]
+
+    def set(self, index: int, header: str, value: str) -> None:
+        column = self._columns[header]
+        values = [self.get(index, h) for h in self.headers]
+        values[self._positions[header]] = value
+        with self._db:
+            if self.fts:  # external content, the old row is removed by value
+                self._db.execute(
+                    f"INSERT INTO labels_fts(labels_fts, rowid, {', '.join(self._columns.values())})"
+                    f" SELECT 'delete', idx, {', '.join(self._columns.values())}"
+                    " FROM labels WHERE idx = ?",
+                    (index,),
+                )
+            self._db.execute(
+                f"UPDATE labels SET {column} = ?, hash = ? WHERE idx = ?",
+                (value, hash_values(values) - HASH_OFFSET, index),
+            )
+            if self.fts:
+                self._db.execute(
+                    f"INSERT INTO labels_fts(rowid, {', '.join(self._columns.values())})"
+                    f" SELECT idx, {', '.join(self._columns.values())}"
+                    " FROM labels WHERE idx = ?",
+                    (index,),
+                )
+        self._rows.pop(index, None)
+        self._invalidate_state()
+
+    def row_hash(self, index: int) -> int:
+        (row_hash,) = self._db.execute(
+            "SELECT hash FROM labels WHERE idx = ?", (index,)
+        ).fetchone()
+        return row_hash + HASH_OFFSET
+
+    def hashes(self) -> array:
+        return array(
+            "Q",
+            (
+                h + HASH_OFFSET
+                for (h,) in self._db.execute("SELECT hash FROM labels ORDER BY idx")
+            ),
+        )
+
+    def diff(self, old_hashes: array) -> dict[str, list[int]]:
+        new_hashes = self.hashes()
+        common = min(len(new_hashes), len(old_hashes))
+        return {
+            "added": list(range(common, len(new_hashes))),
+            "removed": list(range(common, len(old_hashes))),
+            "modified": [i for i in range(common) if new_hashes[i] != old_hashes[i]],
+        }
+
+    def rows(self, indexes) -> list[LabelRow]:
+        indexes = list(indexes)
+        if len(indexes) <= ROW_CACHE_SIZE:
+            self._fetch(indexes)  # one query for the page instead of one per cell
+        return [LabelRow(self, index) for index in indexes]
+
+    def column(self, header: str):
+        # a cursor, the column is never held in memory as a whole
+        column = self._columns[header]
+        return (
+            v for (v,) in self._db.execute(f"SELECT {column} FROM labels ORDER BY idx")
+        )
+
+    def distinct(self, header: str) -> list[str]:
+        # in order of first appearance, same as LabelTable
+        column = self._columns[header]
+        query = f"SELECT {column} FROM labels GROUP BY {column} ORDER BY MIN(idx)"
+        return [v for (v,) in self._db.execute(query)]
+
+    def where(self, header: str, value: str) -> list[int]:
+        column = self._columns[header]
+        query = f"SELECT idx FROM labels WHERE {column} = ? ORDER BY idx"
+        return [i for (i,) in self._db.execute(query, (value,))]
+
+    def _like(self, pattern: str, headers: list[str]) -> list[int]:
+        # fts5 trigram answers LIKE from its index, but not with an ESCAPE
+        # clause, so it is only added when the text had wildcards to escape
+        table, key = ("labels_fts", "rowid") if self.fts else ("labels", "idx")
+        escape = " ESCAPE '\\'" if "\\" in pattern else ""
+        found = set()
+        for header in headers:
+            column = self._columns[header]
+            query = f"SELECT {key} FROM {table} WHERE {column} LIKE ?{escape}"
+            found.update(i for (i,) in self._db.execute(query, (pattern,)))
+        return sorted(found)
+
+    def search(self, text: str, headers: list[str]) -> list[int]:
+        if self.fts and len(text) >= 3 and headers:
+            # trigram phrase query, a case-insensitive substring match
+            columns = " ".join(self._columns[h] for h in headers)
+            phrase = text.replace('"', '""')
+            query = "SELECT rowid FROM labels_fts WHERE labels_fts MATCH ?"
+            found = self._db.execute(query, (f'{{{columns}}}: "{phrase}"',))
+            return sorted(i for (i,) in found)
+        return self._like(f"%{_escape_like(text)}%", headers)
+
+    def match(self, starts_with: str, ends_with: str, headers: list[str]) -> list[int]:
+        pattern = f"{_escape_like(starts_with)}%{_escape_like(ends_with)}"
+        return self._like(pattern, headers)
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def create(mode: str, file: str, sheet_name: str, headers: list[str]) -> LabelStore:
+    """
+    mode: "temp" for a private temporary database, "file" for one next to
+    the excel file that later loads can reuse
+
+    a file that can't be written (read-only folder or database) falls back
+    to a temporary database, the load only loses its reuse
+    """
+    if mode == "file":
+        try:
+            return LabelStore.create(store_path(file, sheet_name), headers)
+        except sqlite3.Error:
+            pass
+    return LabelStore.create("", headers)
+
+
+def load(
+    file: str, sheet_name: str, header_dict: dict, column_indices: list[int]
+) -> tuple[LabelStore, dict] | None:
+    """
+    reopens the store next to file if it was fully built from the current
+    version of the file, returns (store, validator_state) like sheetcache.load
+    """
+    key = cache_key(file, sheet_name)
+    path = store_path(file, sheet_name)
+    if key is None or not os.path.exists(path):
+        return None
+    try:
+        db = sqlite3.connect(path)
+        row = db.execute("SELECT state FROM meta").fetchone()
+        db.close()
+        if row is None:
+            return None
+        state = marshal.loads(row[0])
+    except (sqlite3.Error, ValueError, EOFError, TypeError):
+        return None
+    if (
+        state["key"] != key
+        or dict(state["header_dict"]) != header_dict
+        or not set(column_indices) <= set(state["column_indices"])
+    ):
+        return None
+    store = LabelStore(path, state["headers"])
+    store.fts = state["fts"]
+    validator_state = {
+        "column_indices": state["column_indices"],
+        "regex": dict(state["regex"]),
+        "invalid": {
+            h: bytearray(bitmap)
+            for h, bitmap in zip(state["headers"], state["invalid"])
+        },
+        "row_count": state["row_count"],
+    }
+    return store, validator_state
@@ -0,0 +1,243 @@
+"""
+Columnar store for the label rows read from excel
+
+Every header keeps a list of its distinct (interned) values and an
+array of 4 byte codes into that list, one code per row, so repeated
+values like locations or batches are only stored once
+
+LabelRow is a lightweight view of a single row that reads like the
+{header: value} dicts used before, so it can be handed to anything
+that expects a row dict
+
+DEFINITIONS:
+ - index: position of the row in the table, 0 is the first row under the headers
+ - code: position of a value in its column's distinct value list
+ - row hash: 64 bit digest of a row's values, equal rows hash equal across
+   tables and sessions
+"""
+
+import hashlib
+import sys
+from array import array
+
+
+def hash_values(values) -> int:
+    # row hash, shared with labelstore so both give equal hashes
+    joined = "\x1f".join(values)
+    digest = hashlib.blake2b(joined.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def contains_match(text: str):
+    # case-insensitive contains, like QTableWidget.findItems(MatchContains)
+    text = text.casefold()
+    return lambda value: text in value.casefold()
+
+
+def affix_match(starts_with: str, ends_with: str):
+    # case-insensitive starts with and/or ends with, empty affixes match all
+    starts_with, ends_with = starts_with.casefold(), ends_with.casefold()
+    return lambda value: (
+        len(value) >= len(starts_with) + len(ends_with)
+        and value.casefold().startswith(starts_with)
+        and value.casefold().endswith(ends_with)
+    )
+
+
+class LabelRow:
+    __slots__ = ("_table", "index")
+
+    def __init__(self, table, index: int):
+        self._table = table
+        self.index = index
+
+    def __getitem__(self, header: str) -> str:
+        return self._table.get(self.index, header)
+
+    def __setitem__(self, header: str, value: str) -> None:
+        self._table.set(self.index, header, value)
+
+    def __contains__(self, header: str) -> bool:
+        return header in self._table.headers
+
+    def __iter__(self):
+        return iter(self._table.headers)
+
+    def __len__(self) -> int:
+        return len(self._table.headers)
+
+    def get(self, header: str, default=None):
+        if header not in self._table.headers:
+            return default
+        return self._table.get(self.index, header)
+
+    def keys(self) -> list[str]:
+        return self._table.headers
+
+    def values(self) -> list[str]:
+        return [self._table.get(self.index, h) for h in self._table.headers]
+
+    def items(self) -> list[tuple[str, str]]:
+        return [(h, self._table.get(self.index, h)) for h in self._table.headers]
+
+    def to_dict(self) -> dict[str, str]:
+        return dict(self.items())
+
+
+class LabelTable:
+    def __init__(self, headers: list[str]):
+        self.headers = list(headers)
+        self._values = {h: [] for h in self.headers}  # code -> value
+        self._codes_of = {h: {} for h in self.headers}  # value -> code
+        self._codes = {h: array("I") for h in self.headers}  # row -> code
+        self._hashes = array("Q")  # row -> row hash, filled lazily
+        self._length = 0
+
+    @classmethod
+    def from_columns(
+        cls, headers: list[str], columns: dict[str, tuple[list[str], array]]
+    ) -> "LabelTable":
+        """
+        rebuilds a table from the output of columns(), used by sheetcache
+        """
+        table = cls(headers)
+        for header, (values, codes) in columns.items():
+            values = [sys.intern(value) for value in values]
+            table._values[header] = values
+            table._codes_of[header] = {v: code for code, v in enumerate(values)}
+            table._codes[header] = codes
+            table._length = len(codes)
+        return table
+
+    def columns(self) -> dict[str, tuple[list[str], array]]:
+        # {header: (distinct values, codes)}, shared, not copied
+        return {h: (self._values[h], self._codes[h]) for h in self.headers}
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> LabelRow:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("label row index out of range")
+        return LabelRow(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield LabelRow(self, index)
+
+    def _encode(self, header: str, value: str) -> int:
+        codes_of = self._codes_of[header]
+        code = codes_of.get(value)
+        if code is None:
+            code = len(self._values[header])
+            value = sys.intern(value)
+            self._values[header].append(value)
+            codes_of[value] = code
+        return code
+
+    def append(self, row: dict[str, str]) -> None:
+        for header in self.headers:
+            self._codes[header].append(self._encode(header, row.get(header, "")))
+        self._length += 1
+
+    def extend(self, rows: list[dict[str, str]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def extend_columns(
+        self, columns: dict[str, tuple[list[str], array]], row_count: int
+    ) -> None:
+        """
+        appends another table's columns() (e.g. from a worker process),
+        only the distinct values are re-encoded, the codes are remapped
+        """
+        for header in self.headers:
+            if header not in columns:
+                self._codes[header].extend([self._encode(header, "")] * row_count)
+                continue
+            values, codes = columns[header]
+            remap = [self._encode(header, value) for value in values]
+            self._codes[header].extend(map(remap.__getitem__, codes))
+        self._length += row_count
+
+    def get(self, index: int, header: str) -> str:
+        return self._values[header][self._codes[header][index]]
+
+    def set(self, index: int, header: str, value: str) -> None:
+        self._codes[header][index] = self._encode(header, value)
+        if index < len(self._hashes):
+            self._hashes[index] = self._hash_row(index)
+
+    def _hash_row(self, index: int) -> int:
+        return hash_values(self.get(index, h) for h in self.headers)
+
+    def row_hash(self, index: int) -> int:
+        for i in range(len(self._hashes), self._length):
+            self._hashes.append(self._hash_row(i))
+        return self._hashes[index]
+
+    def hashes(self) -> array:
+        if self._length:
+            self.row_hash(self._length - 1)
+        return self._hashes
+
+    def diff(self, old_hashes: array) -> dict[str, list[int]]:
+        """
+        compares against the hashes() of an older load of the same sheet,
+        row by row
+
+        returns {"added": [...], "removed": [...], "modified": [...]} where
+        added/modified index this table and removed indexes the older one
+        """
+        new_hashes = self.hashes()
+        common = min(len(new_hashes), len(old_hashes))
+        return {
+            "added": list(range(common, len(new_hashes))),
+            "removed": list(range(common, len(old_hashes))),
+            "modified": [i for i in range(common) if new_hashes[i] != old_hashes[i]],
+        }
+
+    def rows(self, indexes) -> list[LabelRow]:
+        return [LabelRow(self, index) for index in indexes]
+
+    def column(self, header: str) -> list[str]:
+        values = self._values[header]
+        return [values[code] for code in self._codes[header]]
+
+    def distinct(self, header: str) -> list[str]:
+        values = self._values[header]
+        return [values[code] for code in sorted(set(self._codes[header]))]
+
+    def where(self, header: str, value: str) -> list[int]:
+        """
+        indexes of the rows where header == value, compares the codes
+        so no strings are touched while scanning
+        """
+        code = self._codes_of[header].get(value)
+        if code is None:
+            return []
+        return [i for i, c in enumerate(self._codes[header]) if c == code]
+
+    def _filter(self, headers: list[str], match) -> list[int]:
+        # tests each distinct value once, then scans the codes
+        found = set()
+        for header in headers:
+            codes = {c for c, v in enumerate(self._values[header]) if match(v)}
+            if codes:
+                found.update(i for i, c in enumerate(self._codes[header]) if c in codes)
+        return sorted(found)
+
+    def search(self, text: str, headers: list[str]) -> list[int]:
+        """
+        indexes of the rows where any of headers contains text
+        """
+        return self._filter(headers, contains_match(text))
+
+    def match(self, starts_with: str, ends_with: str, headers: list[str]) -> list[int]:
+        """
+        indexes of the rows where any of headers starts and ends with the
+        given text, either may be empty
+        """
+        return self._filter(headers, affix_match(starts_with, ends_with))
@@ -8,14 +8,25 @@ DEFINITIONS:
 
 import segno
 from barcode import Gs1_128
-from barcode.writer import ImageWriter
 import tempfile
-from PIL import Image, ImageFont, ImageDraw
-from . import exttools
+from PIL import Image, ImageFont, ImageDraw, ImageOps
+from . import exttools, fontregistry, elementcache
 import code
+import functools
 from pprint import pprint
 import math
 
+QR_CACHE_SIZE = 4096  # encoded symbols kept by make_qr
+BAR_MODULE_WIDTH = 0.2  # mm, python-barcode's default
+BAR_MODULE_HEIGHT = 15.0  # mm
+ELEMENT_CACHE_MB = 64
+LAYOUT_MEMO_MB = 4
+
+# generated and rasterized elements, shared by every label of the session
+element_cache = elementcache.ElementCache(ELEMENT_CACHE_MB)
+# final coords per element size signature, see layout_region
+layout_memo = elementcache.ElementCache(LAYOUT_MEMO_MB)
+
 
 def label_size_translator(
     info: tuple[tuple[int, int], int, str],
@@ -46,24 +57,18 @@ def label_size_translator(
 
 def gen_asset_maps(
     element_maps,
-    element_fn_map,
-    element_regions_map,
-    label_map,
-    regions,
-    element_resizeable,
-    margins,
-    alignment,
+    layout_plan,
     progress_dialog,
+    bilevel=False,
 ):
     """
     Now the element map should contain a dict
 
-    element_fn_map: (index, gen_fn, unpack_fn)
-
     element_maps: list of dicts, one label per dict
 
-    landscape or portrait is actually just decided by the regions,
-    an qt bbox that determines which area elements are assigned to
+    layout_plan: layoutplan.LayoutPlan with its margins set, landscape or
+    portrait is actually just decided by its regions, an qt bbox that
+    determines which area elements are assigned to
 
     QR is always element 0
     """
@@ -71,16 +76,7 @@ def gen_asset_maps(
     desc_maps = []
     step = 0
     for element_map in element_maps:
-        img_coords_map, desc_map = arrange_label(
-            element_map,
-            element_fn_map,
-            element_regions_map,
-            label_map,
-            regions,
-            element_resizeable,
-            margins,
-            alignment,
-        )
+        img_coords_map, desc_map = arrange_label(element_map, layout_plan, bilevel)
 
         _temp_coords_array.append(img_coords_map)
         desc_maps.append(desc_map)
@@ -181,26 +177,22 @@ def create_element_maps(
                 if pos in posits:
                     label_string += f"{text},"
             label_string = label_string[:-1]
+            region_size = tuple(regions[element_region_map[pos]]["size"])
             match fn.__name__:
                 case "gen_qr":
-                    element_map[pos] = fn(
-                        label_string, regions[element_region_map[pos]]["size"]
-                    )
-                    module_size = element_map[pos]["module_size"]
+                    args = (label_string, region_size)
                 case "gen_barcode":
-                    element_map[pos] = fn(label_string)
+                    args = (label_string,)
                 case "gen_font":
-                    element_map[pos] = fn(
-                        label_string,
-                        regions[element_region_map[pos]]["size"],
-                        font_name,
-                    )
+                    args = (label_string, region_size, font_name)
                 case "gen_title":
-                    element_map[pos] = fn(
-                        label_string,
-                        regions[element_region_map[pos]]["size"],
-                        title_font_name,
-                    )
+                    args = (label_string, region_size, title_font_name)
+            # copied, unpacking fills in the final font size
+            element_map[pos] = dict(
+                element_cache.get((fn.__name__, *args), lambda: fn(*args))
+            )
+            if fn.__name__ == "gen_qr":
+                module_size = element_map[pos]["module_size"]
         element_maps.append(element_map)
     return element_maps, module_size
 
@@ -218,12 +210,11 @@ def gen_qr(label_string: str, region_size: tuple[int, int]) -> str:
 
 
 def gen_barcode(label_string: str) -> str:
-    barcode = Gs1_128(label_string, writer=ImageWriter())
-    barcode.text = ""
+    barcode = Gs1_128(label_string)
     return {
         "asset": barcode,
         "label_text": label_string,
-        "module_width": barcode.default_writer_options["module_width"],
+        "module_width": BAR_MODULE_WIDTH,
         "barcode_type": barcode.name,
     }
 
@@ -278,112 +269,200 @@ def get_label_regions(
 
 def unpack_qr_map(qr_info, label_width):
     """
-    unpack the qr tuple
+    measure the qr, drawn later by rasterize_qr at this size
     qr_info: (segno qr object, module, desc)
+    returns (size, desc)
     """
-    qr = qr_info["asset"]
-    with tempfile.NamedTemporaryFile(
-        prefix=f"qr", suffix=".png", delete=False
-    ) as temp_qr:
-        qr.save(
-            temp_qr, scale=qr_info["module_size"], border=0
-        )  # scale beyond label size for resize quality
-        __temp_qr_img = Image.open(temp_qr)
-        __temp_qr_img = __temp_qr_img.resize(
-            (
-                label_width,
-                label_width,
-            )  # basically just the width of the label
-        )
-        size = __temp_qr_img.size
-        desc = desc_builder(qr_info)
-        return __temp_qr_img, size, desc
+    modules = qr_info["asset"].symbol_size(scale=1, border=0)[0]
+    assert modules <= label_width, (
+        f"The QR code of {short_text(qr_info['label_text'])} is {modules} "
+        f"modules wide and doesn't fit its {label_width}px region, shorten "
+        f"the text or use a larger label or a higher dpi"
+    )
+    width = qr_layout(qr_info["asset"], label_width)[0]
+    desc = desc_builder(qr_info)
+    return (width, width), desc
+
+
+def qr_layout(qr, label_width: int) -> tuple[int, int, int]:
+    # (image width, module scale, offset of the symbol), the symbol fits
+    # label_width at 1px a module, unpack_qr_map checked
+    modules = qr.symbol_size(scale=1, border=0)[0]
+    scale = max(1, label_width // modules)
+    return label_width, scale, (label_width - modules * scale) // 2
+
+
+def rasterize_qr(qr, label_width: int) -> Image.Image:
+    """
+    1-bit image of the symbol straight from its module matrix, each module
+    is a whole number of pixels so edges stay exact, the remainder of
+    label_width is split around the symbol as white space
+    """
+    width, scale, offset = qr_layout(qr, label_width)
+    dark, light = b"\x00" * scale, b"\xff" * scale
+    blank = b"\xff" * width
+    rows = [blank] * offset
+    for matrix_row in qr.matrix:
+        row = b"".join(dark if module & 1 else light for module in matrix_row)
+        row = b"\xff" * offset + row + b"\xff" * (width - offset - len(row))
+        rows.extend([row] * scale)
+    rows.extend([blank] * (width - len(rows)))
+    __temp_qr_img = Image.frombytes("L", (width, width), b"".join(rows))
+    return __temp_qr_img.convert("1", dither=Image.Dither.NONE)
 
 
 def unpack_bar_map(bar_info, label_width):
     """
-    unpack the bar tuple
+    measure the bars, drawn later by rasterize_bar at this size
     bar_info: (barcode object, desc)
+    returns (size, desc)
     """
-    barcode = bar_info["asset"]
-    with tempfile.NamedTemporaryFile(
-        prefix=f"{barcode.get_fullcode()}-barcode-", suffix=".png", delete=False
-    ) as temp_bar:
-        barcode.write(
-            temp_bar,
-            options={
-                "write_text": False,
-                "quiet_zone": 0,
-                "margin_top": 0,
-                "margin_bottom": 0,
-            },
-        )
-        __temp_bar_img = Image.open(temp_bar)
-        bar_aspect_ratio = __temp_bar_img.size[1] / __temp_bar_img.size[0]
-        __temp_bar_img = __temp_bar_img.resize(
-            (
-                label_width,
-                int(label_width * bar_aspect_ratio),
-            )  # basically just the width of the label
-        )
-        size = __temp_bar_img.size
-        desc = desc_builder(bar_info)
-        return __temp_bar_img, size, desc
+    pattern = bar_pattern(bar_info["label_text"])
+    assert len(pattern) <= label_width, (
+        f"The barcode of {short_text(bar_info['label_text'])} is {len(pattern)} "
+        f"modules wide and doesn't fit its {label_width}px region, shorten "
+        f"the text or use a larger label or a higher dpi"
+    )
+    width, height = bar_layout(pattern, label_width)[:2]
+    desc = desc_builder(bar_info)
+    return (width, height), desc
+
+
+def bar_layout(
+    pattern: str,
+    label_width: int,
+    module_width: float = BAR_MODULE_WIDTH,
+    module_height: float = BAR_MODULE_HEIGHT,
+) -> tuple[int, int, int]:
+    """
+    (image width, full height, module scale) of the bars, height keeps the
+    module_height / module_width proportions (mm) of the barcode at label_width,
+    the bars fit label_width at 1px a module, unpack_bar_map checked
+    """
+    scale = max(1, label_width // len(pattern))
+    height = max(1, int(label_width * module_height / (module_width * len(pattern))))
+    return label_width, height, scale
+
+
+def rasterize_bar(pattern: str, label_width: int, height: int = None) -> Image.Image:
+    """
+    1-bit image of the bars straight from the barcode's module pattern,
+    every module is a whole number of pixels wide so bar edges stay sharp,
+    the remainder of label_width is split around the bars
+
+    height: shorter bars if the layout had to cut them down, full height
+    if None
+    """
+    width, full_height, scale = bar_layout(pattern, label_width)
+    height = height or full_height
+    dark, light = b"\x00" * scale, b"\xff" * scale
+    bars = b"".join(dark if module == "1" else light for module in pattern)
+    left = (width - len(bars)) // 2
+    row = b"\xff" * left + bars + b"\xff" * (width - left - len(bars))
+    __temp_bar_img = Image.frombytes("L", (width, height), row * height)
+    return __temp_bar_img.convert("1", dither=Image.Dither.NONE)
 
 
 def unpack_title_map(text_info, label_width):
     """
-    unpack the title tuple
+    measure the title
     same as text but no description
     text_info: (font object, string, desc)
+    returns (size, desc)
     """
-    font = text_info["asset"]
-    label_string = text_info["label_text"]
-    font_mask = font.getmask(label_string, start=(0, 0))
-    # (_, font_descent) = font.getmetrics()
-    # size_without_descent = (font_mask.size[0], font_mask.size[1] + font_descent)
-    __temp_text_img = Image.frombytes(
-        font_mask.mode,
-        font_mask.size,
-        bytes([255 - byte for byte in bytes(font_mask)]),
-    )
-    text_aspect_ratio = __temp_text_img.size[1] / __temp_text_img.size[0]
-    __temp_text_img = __temp_text_img.resize(
-        (
-            label_width,
-            int(label_width * text_aspect_ratio),
-        )  # basically just the width of the label
-    )
-    size = __temp_text_img.size
-    return __temp_text_img, size, None
+    size = fit_text(text_info, label_width)
+    return size, None
 
 
 def unpack_text_map(text_info, label_width):
     """
-    unpack the text tuple
+    measure the text, drawn later by text_image at this size
     text_info: (font object, string, desc)
+    returns (size, desc)
+    """
+    size = fit_text(text_info, label_width)
+    desc = desc_builder(text_info)
+    return size, desc
+
+
+def fit_text(text_info, label_width):
+    # the largest size narrower than label_width, from glyph metrics only
+    font_path = exttools.get_font_path(text_info["font"])
+    font_size = fontregistry.fit_font_size(
+        font_path, text_info["label_text"], label_width
+    )
+    return resize_text(text_info, font_size)
+
+
+def resize_text(text_info, font_size):
+    """
+    size of the text at font_size, the font and size are kept in text_info
+    so the description and the render pass match
     """
-    font = text_info["asset"]
-    label_string = text_info["label_text"]
+    set_font_size(text_info, font_size)
+    return text_size(text_info["label_text"], text_info["font"], font_size)
+
+
+def set_font_size(text_info, font_size):
+    font = fontregistry.get_font(exttools.get_font_path(text_info["font"]), font_size)
+    text_info.update({"asset": font, "font_size": font_size})
+
+
+def text_size(label_string: str, font_name: str, font_size: int) -> tuple[int, int]:
+    # the size text_image will have, from freetype's layout without drawing
+    font = fontregistry.get_font(exttools.get_font_path(font_name), font_size)
+    left, top, right, bottom = font.getbbox(label_string)
+    return right - left, bottom - top
+
+
+def cached_text_image(
+    label_string: str, font_name: str, font_size: int, bilevel: bool = False
+) -> Image.Image:
+    key = ("text_image", label_string, font_name, font_size, bilevel)
+    return element_cache.get(
+        key, lambda: text_image(label_string, font_name, font_size, bilevel)
+    )
+
+
+def text_image(
+    label_string: str, font_name: str, font_size: int, bilevel: bool = False
+) -> Image.Image:
+    font = fontregistry.get_font(exttools.get_font_path(font_name), font_size)
     font_mask = font.getmask(label_string, start=(0, 0))
     # (_, font_descent) = font.getmetrics()
     # size_without_descent = (font_mask.size[0], font_mask.size[1] + font_descent)
-    __temp_text_img = Image.frombytes(
-        font_mask.mode,
-        font_mask.size,
-        bytes([255 - byte for byte in bytes(font_mask)]),
-    )
-    text_aspect_ratio = __temp_text_img.size[1] / __temp_text_img.size[0]
-    __temp_text_img = __temp_text_img.resize(
-        (
-            label_width,
-            int(label_width * text_aspect_ratio),
-        )  # basically just the width of the label
-    )
-    size = __temp_text_img.size
+    __temp_text_img = Image.frombytes(font_mask.mode, font_mask.size, bytes(font_mask))
+    __temp_text_img = ImageOps.invert(__temp_text_img)
+    return to_bilevel(__temp_text_img) if bilevel else __temp_text_img
 
-    desc = desc_builder(text_info)
-    return __temp_text_img, size, desc
+
+def render_element(fn_name, info, region_width, size, bilevel=False):
+    """
+    render pass, draws one element once at the size the layout settled on
+    """
+    match fn_name:
+        case "gen_qr":
+            key = ("qr_image", info["label_text"], region_width)
+            return element_cache.get(
+                key, lambda: rasterize_qr(info["asset"], region_width)
+            )
+        case "gen_barcode":
+            key = ("bar_image", info["label_text"], region_width, size[1])
+            return element_cache.get(
+                key,
+                lambda: rasterize_bar(
+                    bar_pattern(info["label_text"]), region_width, size[1]
+                ),
+            )
+        case "gen_font" | "gen_title":
+            return cached_text_image(
+                info["label_text"], info["font"], info["font_size"], bilevel
+            )
+
+
+def short_text(text: str, limit: int = 40) -> str:
+    # for error messages, label text can be anything up to a full qr payload
+    return text if len(text) <= limit else text[: limit - 3] + "..."
 
 
 def desc_builder(info):
@@ -396,87 +475,156 @@ def desc_builder(info):
 
 def arrange_label(
     element_map: dict[int, tuple],
-    element_fn_map: list[int, object, object],
-    element_regions_map: dict[int, int],
-    label_map: dict[int, str],
-    regions: dict[int, list],
-    element_resizable_map: dict[int, bool],
-    margins: tuple[int],
-    alignment: str,
+    layout_plan: object,
+    bilevel: bool = False,
 ) -> dict[int, tuple[int]]:
     """
-    element_fn_map: [pos, gen_fn, unpack_fn]
+    Take the positions defined in the plan
+    Measure the asset at that position using element_map
 
-    Open a new bg image baesd on label_size_pix
+    Place the assets region by region
+    resize according to the plan's element_resizable_map, on sizes only
 
-    Take the positions defined in the label map
-    Unpack the correct asset at that position using element_map
-
-    Place the assets onto the bg image
-    resize iteratively according to element_resizable
+    then draw every asset once at its final size
 
     return the coords of each asset for pdf and zpl generation
 
-    element map is always {pos: (object, config info, desc)}
+    element map is always {pos: (object, config info, desc)}, the sorting,
+    clustering and region geometry all come ready made from layout_plan
     """
     # Map of every image to its indexed position
     img_coords_map = {}
     # Map of every description to the indexed position
     desc_map = {}
-
-    """
-    sort everything again!? i know this is triple checking at this point
-    but we really want to make sure that the indexes line up
+    margins = layout_plan.margins
     """
-    element_fn_map = dict(sorted(element_fn_map.items()))
-    element_map = dict(sorted(element_map.items()))
-    element_resizable_map = dict(sorted(element_resizable_map.items()))
-    element_regions_map = dict(sorted(element_regions_map.items()))
+    Does a virtual placing of sizes to coords, so we resize virtually
+    without drawing anything until the layout is final
     """
-    Does a virtual placing of imgs to coords, so we resize virtually
-    without needing to repaste images
-    """
-
-    clustered_regions = _cluster_regions(element_regions_map)
-    # so we can add margins after resizing
-    for r_key, ele_keys in clustered_regions.items():
-        # remove margins first, get a dict of pos index: label width
-        region_width = regions[r_key]["size"][0] - (margins[0] * 2)
-        region_height = regions[r_key]["size"][1]
-        region_offset = (regions[r_key]["xyxy"][0], regions[r_key]["xyxy"][1])
-        local_element_map = {
-            i: asset for i, asset in element_map.items() if i in ele_keys
-        }
-        local_element_fn_map = {
-            i: fns for i, fns in element_fn_map.items() if i in ele_keys
-        }
+    for region_layout in layout_plan.region_layouts:
+        local_element_map = {i: element_map[i] for i in region_layout.positions}
         local_img_coords_map = {}
         for img_coords_pair, desc_coords_pair in unpack_and_gen_coord_maps(
-            local_element_map, local_element_fn_map, region_width, margins
+            local_element_map,
+            region_layout.element_fn_map,
+            region_layout.region_width,
+            margins,
         ):
             if desc_coords_pair is not None:
                 local_img_coords_map.update(img_coords_pair)
                 desc_map.update(desc_coords_pair)
             else:
-                # check endpoint of final image for over/underflow
-                y_delta = img_coords_pair[1] - region_height
-                local_img_coords_map = smart_resize(
-                    local_img_coords_map,
-                    element_resizable_map,
-                    element_fn_map,
-                    label_map,
-                    y_delta,
-                    margins,
-                    region_height,
-                )
-        local_img_coords_map = _align(alignment, local_img_coords_map, region_width)
-        local_img_coords_map = _apply_offset(local_img_coords_map, region_offset)
-        img_coords_map.update(local_img_coords_map)
-
-    img_coords_map = dict(sorted(img_coords_map.items()))
+                end_coord = img_coords_pair
+        local_img_coords_map = layout_region(
+            local_img_coords_map,
+            local_element_map,
+            layout_plan,
+            region_layout,
+            end_coord,
+        )
+        # resized text changed font size
+        desc_map.update(
+            {
+                i: desc_builder(local_element_map[i])
+                for i in local_img_coords_map
+                if desc_map.get(i) is not None
+            }
+        )
+        # render pass
+        for pos, (_, seed, size) in local_img_coords_map.items():
+            img_asset = render_element(
+                region_layout.element_fn_map[pos][0].__name__,
+                local_element_map[pos],
+                region_layout.region_width,
+                size,
+                bilevel,
+            )
+            img_coords_map[pos] = (img_asset, seed, size)
+
+    img_coords_map = {i: img_coords_map[i] for i in layout_plan.positions}
     return img_coords_map, desc_map
 
 
+def layout_region(img_coords_map, element_map, layout_plan, region_layout, end_coord):
+    """
+    final coords of one region's assets
+
+    rows whose elements measured the same sizes (and font sizes) end up
+    with the same layout, so it is kept in layout_memo under
+    (plan id, margins, region, size signature) and only applied to the
+    next row with that signature
+    """
+    signature = tuple(
+        (size, element_map[pos].get("font_size"))
+        for pos, (_, _, size) in img_coords_map.items()
+    )
+    key = (layout_plan.plan_id, layout_plan.margins, region_layout.region, signature)
+    computed = {}
+
+    def compute():
+        computed.update(
+            _compute_layout(
+                img_coords_map, element_map, layout_plan, region_layout, end_coord
+            )
+        )
+        return {
+            pos: (seed, size, element_map[pos].get("font_size"))
+            for pos, (_, seed, size) in computed.items()
+        }
+
+    geometry = layout_memo.get(key, compute)
+    if computed:
+        return computed
+    placed = _apply_layout(img_coords_map, element_map, geometry)
+    if placed is None:  # same sizes, but the smaller text measures different
+        return _compute_layout(
+            img_coords_map, element_map, layout_plan, region_layout, end_coord
+        )
+    return placed
+
+
+def _compute_layout(img_coords_map, element_map, layout_plan, region_layout, end_coord):
+    # check endpoint of final image for over/underflow
+    y_delta = end_coord[1] - region_layout.region_height
+    img_coords_map = smart_resize(
+        img_coords_map,
+        element_map,
+        layout_plan.element_resizable_map,
+        layout_plan.element_fn_map,
+        layout_plan.label_map,
+        y_delta,
+        layout_plan.margins,
+        region_layout.region_height,
+    )
+    img_coords_map = _align(
+        layout_plan.alignment, img_coords_map, region_layout.region_width
+    )
+    return _apply_offset(img_coords_map, region_layout.region_offset)
+
+
+def _apply_layout(img_coords_map, element_map, geometry):
+    """
+    places the assets by a memoized geometry {pos: (seed, size, font size)},
+    None if an asset doesn't measure the memoized size, nothing is
+    changed in that case
+    """
+    placed = {}
+    for pos, (img_asset, _, size) in img_coords_map.items():
+        seed, final_size, font_size = geometry[pos]
+        info = element_map[pos]
+        if font_size is not None and font_size != info["font_size"]:
+            size = text_size(info["label_text"], info["font"], font_size)
+        elif final_size != size:  # bars are cut down, never scaled
+            size = (size[0], final_size[1])
+        if size != final_size:
+            return None
+        placed[pos] = (img_asset, seed, final_size)
+    for pos, (_, _, font_size) in geometry.items():
+        if font_size is not None:
+            set_font_size(element_map[pos], font_size)
+    return placed
+
+
 def _align(align_type, map, region_width):
     match align_type:
         case "left":
@@ -484,7 +632,10 @@ def _align(align_type, map, region_width):
                 i: (_ia, (0, _seed[1]), _sz) for i, (_ia, _seed, _sz) in map.items()
             }
         case "center":
-            _map = map
+            _map = {
+                i: (_ia, ((region_width - _sz[0]) // 2, _seed[1]), _sz)
+                for i, (_ia, _seed, _sz) in map.items()
+            }
         case "right":
             _map = {
                 i: (_ia, (region_width - _sz[0], _seed[1]), _sz)
@@ -493,16 +644,6 @@ def _align(align_type, map, region_width):
     return _map
 
 
-def _cluster_regions(_erm):
-    # get back a one-time use region: elements dict
-    clustered = {}
-    for e, r in _erm.items():
-        if r not in clustered.keys():
-            clustered[r] = []
-        clustered[r].append(e)
-    return clustered
-
-
 def _apply_offset(map, xy_offset):
     _map = {
         i: (_ia, (_seed[0] + xy_offset[0], _seed[1] + xy_offset[1]), _sz)
@@ -512,10 +653,14 @@ def _apply_offset(map, xy_offset):
 
 
 def unpack_and_gen_coord_maps(
-    element_map: dict, element_fn_map: dict, region_width: int, margins: tuple[int, int]
+    element_map: dict,
+    element_fn_map: dict,
+    region_width: int,
+    margins: tuple[int, int],
 ):
     """
-    generates bboxes of all assets
+    generates bboxes of all assets, measure pass, the assets are None
+    until arrange_label draws them
     follows pillow's (left, top, right, bottom) standard
 
     takes the element_regions and places them within those regions
@@ -524,14 +669,31 @@ def unpack_and_gen_coord_maps(
     for (pos, (_, fn)), (pos, element) in zip(
         element_fn_map.items(), element_map.items()
     ):
-        # unpack the objects
-        img_asset, size, desc = fn(element, region_width)
-        yield {pos: (img_asset, tuple(current_coord), size)}, {pos: desc}
+        # measure the objects, or reuse an identical element of another label
+        key = (fn.__name__, element["label_text"], element.get("font"), region_width)
+        size, desc, unpacked = element_cache.get(
+            key, lambda: _unpack(fn, element, region_width)
+        )
+        element.update(unpacked)
+        yield {pos: (None, tuple(current_coord), size)}, {pos: desc}
         current_coord = _step_coord(size, current_coord, margins)
     _step_coord(size, current_coord, margins)
     yield tuple(current_coord), None  # end coords for virtual map
 
 
+def _unpack(fn, element, region_width):
+    # the element info is kept as unpacking left it (fitted font and size)
+    size, desc = fn(element, region_width)
+    return size, desc, dict(element)
+
+
+def to_bilevel(img: Image.Image) -> Image.Image:
+    # qr and bars are drawn 1-bit already, text is thresholded at mid grey
+    if img.mode == "1":
+        return img
+    return img.convert("1", dither=Image.Dither.NONE)
+
+
 def _step_coord(
     size: tuple[int, int], current_coord: list[int, int], margins: tuple[int, int]
 ):
@@ -541,6 +703,7 @@ def _step_coord(
 
 def smart_resize(
     img_coords_map: dict[int, tuple[int]],
+    element_map: dict[int, dict],
     element_resizable_map: dict[int, bool],
     element_fn_map: list[int, object, object],
     label_map: dict[int, str],
@@ -553,8 +716,8 @@ def smart_resize(
     elements if allowed by element_resizable_map
 
     uses the img_coords_map to find out if barcode/text, to peform
-    crop/resize. all img manipulation is done by relative height
-    to total sum of all resizable heights
+    cut/resize. all sizes are reduced by relative height
+    to total sum of all resizable heights, nothing is drawn here
 
     shifts around image seeds to center all x and y coords w margins
 
@@ -575,24 +738,20 @@ def smart_resize(
     ):
         # check if qr, bar, text
         match element_fn_map.get(pos)[0].__name__:
-            # rescale the image if its too large
+            # shrink the size if its too large
             case "gen_qr":
                 pass  # intentional
             case "gen_barcode":
-                img_asset = img_asset.crop((0, 0, size[0], size[1] - reduction))
-                resizable_imgs.update({pos: (img_asset, seed, img_asset.size)})
+                size = (size[0], size[1] - reduction)
+                resizable_imgs.update({pos: (img_asset, seed, size)})
             case "gen_font" | "gen_title":
+                # measured again at the smaller font size rather than scaled
                 scale_factor = (size[1] - reduction) / size[1]
-                img_asset = img_asset.resize(
-                    (
-                        int(size[0] * scale_factor),
-                        int(size[1] * scale_factor),
-                    )
-                )
-                # shift x coord if resized
-                x_offset = int((size[0] - (size[0] * scale_factor)) // 2)
-                new_x_seed = (seed[0] + x_offset, seed[1])
-                resizable_imgs.update({pos: (img_asset, new_x_seed, img_asset.size)})
+                font_size = element_map[pos]["font_size"]
+                new_font_size = max(1, int(font_size * scale_factor))
+                if new_font_size != font_size:
+                    size = resize_text(element_map[pos], new_font_size)
+                resizable_imgs.update({pos: (img_asset, seed, size)})
     for pos, (img_asset, affected_x_seed, affected_size) in resizable_imgs.items():
         if img_coords_map.get(pos - 1) is None:
             # if resizable imgs not included in local region, skip
@@ -688,21 +847,22 @@ def gen_to_list(gen_fn: object) -> list:
 
 
 @gen_to_list
-def gen_labels(img_coords_maps, label_size_pix, margins):
+def gen_labels(img_coords_maps, label_size_pix, margins, bilevel=False):
     """
     Paste everything!
+
+    yields the composed label images, kept in memory by LabelRasterStore
+
+    bilevel: compose in 1-bit (mode "1"), every asset is 1-bit already so
+    nothing is thresholded or dithered on the way
     """
+    mode = "1" if bilevel else "L"
     for img_coords_map in img_coords_maps:
-        with tempfile.NamedTemporaryFile(
-            prefix=f"label", suffix=".png", delete=False
-        ) as temp_label:
-            __temp_bg_img = Image.new(mode="L", size=label_size_pix, color=(255))
-            for _, (img_asset, seed, _) in img_coords_map.items():
-                seed = (seed[0] + margins[0], seed[1])
-                __temp_bg_img.paste(img_asset, seed)
-
-            __temp_bg_img.save(temp_label)
-            yield temp_label
+        __temp_bg_img = Image.new(mode=mode, size=label_size_pix, color=(255))
+        for _, (img_asset, seed, _) in img_coords_map.items():
+            seed = (seed[0] + margins[0], seed[1])
+            __temp_bg_img.paste(img_asset, seed)
+        yield __temp_bg_img
 
 
 def gen_bg(label_string: str, label_size: tuple[int, int]):
@@ -714,34 +874,35 @@ def gen_bg(label_string: str, label_size: tuple[int, int]):
         return temp_bg
 
 
-def auto_qr_sizing(label_string, region_size):
-    qr = segno.make(label_string, micro=False)
-    module_size = 1
-    jumpsize = 5
-    while True:
-        if qr.symbol_size(scale=module_size, border=1)[0] < region_size[0]:
-            module_size += jumpsize
-        else:
-            jumpsize -= 1
-            module_size -= jumpsize
-        if jumpsize <= 1:
-            module_size += 1
-            break
+@functools.lru_cache(maxsize=QR_CACHE_SIZE)
+def make_qr(payload: str, error: str = None, micro: bool = False):
+    """
+    memoized segno.make, symbols are never modified after encoding so
+    repeated payloads and re-renders share one symbol
+    """
+    return segno.make(payload, error=error, micro=micro)
+
+
+@functools.lru_cache(maxsize=QR_CACHE_SIZE)
+def bar_pattern(label_string: str) -> str:
+    """
+    module pattern of the barcode, from a fresh barcode every time since
+    code128 keeps its last charset after build(), building the same
+    barcode object twice doesn't give the same bars
+    """
+    return Gs1_128(label_string).build()[0]
+
+
+def auto_qr_sizing(label_string, region_size, error=None, micro=False):
+    # largest whole module scale where the symbol (with a 1 module border) fits
+    qr = make_qr(label_string, error, micro)
+    modules = qr.symbol_size(scale=1, border=1)[0]
+    module_size = max(1, region_size[0] // modules)
     return qr, module_size
 
 
 def auto_font(font_path: str, label_string: str, region_size: object) -> object:
-    font = ImageFont.truetype(font_path, 1)
     breakpoint = region_size[0] - (region_size[0] / 15)
-    jumpsize = 50
-    fontsize = 1
-    while True:
-        if font.getlength(label_string) < breakpoint:
-            fontsize += jumpsize
-        else:
-            jumpsize //= 2
-            fontsize -= jumpsize
-        font = ImageFont.truetype(font_path, fontsize)
-        if jumpsize <= 1:
-            break
+    fontsize = fontregistry.fit_font_size(font_path, label_string, breakpoint)
+    font = fontregistry.get_font(font_path, fontsize)
     return font, fontsize
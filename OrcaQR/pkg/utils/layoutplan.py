@@ -0,0 +1,86 @@
+"""
+Compiled label layout, worked out once when the label settings are accepted
+
+arrange_label used to re-sort the element maps, re-cluster the regions and
+rebuild the per region maps for every label, and LabelInfo.regions /
+element_regions_map recompute on every access, a LayoutPlan takes one
+snapshot of all of it so each label only applies the plan
+
+Margins come from the QR module size, which is only known once the first
+QR is generated, so they are set on the plan afterwards with set_margins
+
+DEFINITIONS:
+ - pos: element position in the label map, also the paste order
+ - region layout: the elements of one region with the region's geometry,
+   region_width is without the x margins
+"""
+
+from collections import namedtuple
+from itertools import count
+
+RegionLayout = namedtuple(
+    "RegionLayout",
+    "region positions element_fn_map region_width region_height region_offset",
+)
+
+_plan_ids = count()
+
+
+class LayoutPlan:
+    def __init__(
+        self,
+        label_map: dict[int, str],
+        element_fn_map: dict[int, tuple],
+        element_regions_map: dict[int, int],
+        regions: dict[int, dict],
+        element_resizable_map: dict[int, bool],
+        alignment: str,
+    ):
+        self.plan_id = next(_plan_ids)
+        self.label_map = dict(sorted(label_map.items()))
+        self.element_fn_map = dict(sorted(element_fn_map.items()))
+        self.positions = list(self.element_fn_map)
+        self.element_regions_map = {
+            pos: element_regions_map[pos] for pos in self.positions
+        }
+        self.element_resizable_map = dict(sorted(element_resizable_map.items()))
+        self.regions = {
+            r_key: {k: tuple(v) for k, v in region.items() if k in ("xyxy", "size")}
+            for r_key, region in regions.items()
+            if region.get("size") is not None
+        }
+        self.alignment = alignment
+        self.clusters = {}  # region -> positions, in paste order
+        for pos, r_key in self.element_regions_map.items():
+            self.clusters.setdefault(r_key, []).append(pos)
+        self.margins = None
+        self.region_layouts = []
+
+    def set_margins(self, margins: tuple[int, int]) -> None:
+        # the region widths depend on the margins, so they are laid out here
+        if margins == self.margins:
+            return
+        self.margins = margins
+        self.region_layouts = [
+            RegionLayout(
+                region=r_key,
+                positions=positions,
+                element_fn_map={pos: self.element_fn_map[pos] for pos in positions},
+                region_width=self.regions[r_key]["size"][0] - (margins[0] * 2),
+                region_height=self.regions[r_key]["size"][1],
+                region_offset=self.regions[r_key]["xyxy"][:2],
+            )
+            for r_key, positions in self.clusters.items()
+        ]
+
+
+def compile_plan(label_info: object, element_fn_map: dict) -> LayoutPlan:
+    # reads every LabelInfo property once
+    return LayoutPlan(
+        label_map=label_info.label_map,
+        element_fn_map=element_fn_map,
+        element_regions_map=label_info.element_regions_map,
+        regions=label_info.regions,
+        element_resizable_map=label_info.element_resizable_map,
+        alignment=label_info.alignment,
+    )
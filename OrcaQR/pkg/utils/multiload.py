@@ -0,0 +1,103 @@
+"""
+Loads several sheets (of one or more files) in parallel, one per process
+
+load_source runs in a worker process and returns the sheet in columnar form
+(LabelTable.columns()), which pickles far smaller than row dicts, the UI then
+merges the sources in order with extend_columns
+
+Every source is matched by header name, not by column position, so manifests
+whose columns are in a different order still line up
+
+DEFINITIONS:
+ - source: (file, sheet name)
+ - source row: excel row of a label in its own sheet, 2 is the first row
+   under the headers
+"""
+
+import os
+from bisect import bisect_right
+
+from . import exttools, labeltable, rowreaders, sheetcache
+
+
+def load_source(
+    file: str,
+    sheet_name: str,
+    headers: list[str],
+    regex: str,
+    column_regex: dict,
+    backend: str,
+    cache_dir: str,
+    cache_size_mb: int,
+    optional: bool = False,
+) -> dict | None:
+    """
+    reads and validates one sheet, the per sheet cache is used as in a
+    single sheet load
+
+    optional: sheets missing any of headers are skipped (None) instead of
+    raising, used when every sheet of a workbook is loaded
+    """
+    key = sheetcache.cache_key(file, sheet_name)  # before anything is read
+    reader = rowreaders.open_reader(file, sheet_name, backend)
+    try:
+        header_dict = exttools.get_headers(reader)
+        missing = [h for h in headers if h not in header_dict]
+        if missing:
+            if optional:
+                return None
+            raise KeyError(
+                f"{os.path.basename(file)} [{sheet_name}] has no column {', '.join(map(str, missing))}"
+            )
+        column_indices = sorted(header_dict[h] for h in headers)
+        cached = sheetcache.load(
+            cache_dir, file, reader.name, header_dict, column_indices
+        )
+        if cached is not None:
+            table, state = cached
+            validator = exttools.RowValidator.from_state(header_dict, state)
+            changed = validator.update_patterns(regex, column_regex)
+            validator.recheck(table, changed)
+        else:
+            validator = exttools.RowValidator(
+                header_dict, column_indices, regex, column_regex
+            )
+            table = labeltable.LabelTable(validator.headers)
+            rows = exttools.stream_excel(
+                reader, header_dict, regex, headers, {}, [], validator, column_regex
+            )
+            for chunk in exttools.chunk_rows(rows, 5000):
+                table.extend(chunk)
+            sheetcache.save(
+                cache_dir,
+                key,
+                header_dict,
+                table,
+                validator,
+                cache_size_mb,
+            )
+    finally:
+        reader.close()
+    columns = table.columns()
+    return {
+        "file": file,
+        "sheet_name": reader.name,
+        "columns": {h: columns[h] for h in headers},
+        "invalid": {h: validator.invalid[h] for h in headers},
+        "row_count": len(table),
+    }
+
+
+def pool_size(source_count: int) -> int:
+    # one workbook per worker, never more workers than cores
+    return max(1, min(source_count, os.cpu_count() or 1))
+
+
+def source_of(source_starts: list[int], sources: list[tuple], index: int) -> tuple:
+    """
+    (file, sheet name, source row) of label_texts[index], source_starts
+    holds the label_texts index of each source's first row
+    """
+    position = bisect_right(source_starts, index) - 1
+    file, sheet_name = sources[position]
+    return file, sheet_name, index - source_starts[position] + 2
@@ -20,21 +20,19 @@ def translate_locations_pdf(element_map):
     pass
 
 
-def svg_generator(temp_label_paths: list[str]):
+def svg_generator(label_images: list[Image.Image]):
     pass
 
 
-def pdf_generator(pdf, pdf_path: str, temp_label_paths: list[str]) -> None:
-    for label_path in temp_label_paths:
-        append_pdf(pdf, label_path)
+def pdf_generator(pdf, pdf_path: str, label_images: list[Image.Image]) -> None:
+    for label_image in label_images:
+        append_pdf(pdf, label_image)
     pdf.output(pdf_path)
     return pdf
 
 
-def append_pdf(pdf: object, label_path: str) -> None:
-    if not label_path.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp")):
-        return
-    img = Image.open(label_path)
-    img_width, img_height = img.size
+def append_pdf(pdf: object, label_image: Image.Image) -> None:
+    # fpdf takes the pillow image as is, nothing is read from disk
+    img_width, img_height = label_image.size
     pdf.add_page(orientation="portrait", format=(img_width, img_height))
-    pdf.image(label_path, x=0, y=0, w=img_width, h=img_height)
+    pdf.image(label_image, x=0, y=0, w=img_width, h=img_height)
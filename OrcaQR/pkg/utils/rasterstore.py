@@ -0,0 +1,94 @@
+"""
+In-memory store of composed labels, replaces the temporary png per label
+
+Every label is kept as its raw pixel buffer (mode, size, bytes) under the
+id of the row it was rendered from, so nothing is encoded, written to disk
+or decoded again between composing a label and handing it to a sink:
+ - preview and printing: buffer() wraps straight into a QImage
+ - pdf and zpl: image() / images() give pillow images back, no decoding
+
+Buffers are in the label's own mode: with the bilevel setting labels are
+1-bit and stored packed, 8 pixels a byte, as pillow and QImage's
+Format_Mono both lay them out (msb first, rows padded to a whole byte,
+a set bit is white), otherwise they are 8-bit grey, a byte a pixel
+
+Labels are evicted least recently used first once the buffers go over the
+memory budget, the labels of the current selection (shown()) never are
+
+DEFINITIONS:
+ - row id: the row hash the label was rendered from, same as label_renders
+ - buffer: (mode, (width, height), bytes), mode is "1" or "L"
+"""
+
+from collections import OrderedDict
+
+from PIL import Image
+
+
+class LabelRasterStore:
+    def __init__(self, budget_mb: int):
+        self.budget = budget_mb * 1024 * 1024
+        self._buffers = OrderedDict()  # row id -> buffer, oldest first
+        self._shown = set()  # row ids of the current selection
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def __contains__(self, row_id: int) -> bool:
+        return row_id in self._buffers
+
+    def put(self, row_id: int, image: Image.Image) -> None:
+        self.pop(row_id)
+        data = image.tobytes()
+        self._buffers[row_id] = (image.mode, image.size, data)
+        self.nbytes += len(data)
+        self._evict()
+
+    def shown(self, row_ids: list[int]) -> None:
+        """
+        the labels now on screen, they are kept whatever the budget until
+        the next selection, and count as just used
+        """
+        self._shown = set(row_ids)
+        for row_id in row_ids:
+            if row_id in self._buffers:
+                self._buffers.move_to_end(row_id)
+        self._evict()
+
+    def _evict(self) -> None:
+        for row_id in list(self._buffers):
+            if self.nbytes <= self.budget:
+                break
+            if row_id not in self._shown:
+                self.pop(row_id)
+
+    def resize(self, budget_mb: int) -> None:
+        self.budget = budget_mb * 1024 * 1024
+        self._evict()
+
+    def pop(self, row_id: int) -> None:
+        buffer = self._buffers.pop(row_id, None)
+        if buffer is not None:
+            self.nbytes -= len(buffer[2])
+
+    def buffer(self, row_id: int) -> tuple[str, tuple[int, int], bytes]:
+        return self._buffers[row_id]
+
+    def bytes_per_line(self, row_id: int) -> int:
+        mode, (width, _), _ = self._buffers[row_id]
+        return (width + 7) // 8 if mode == "1" else width
+
+    def image(self, row_id: int) -> Image.Image:
+        # read-only, 8-bit labels share the stored bytes
+        mode, size, data = self._buffers[row_id]
+        return Image.frombuffer(mode, size, data, "raw", mode, 0, 1)
+
+    def images(self, row_ids: list[int]):
+        for row_id in row_ids:
+            yield self.image(row_id)
+
+    def clear(self) -> None:
+        self._buffers.clear()
+        self._shown.clear()
+        self.nbytes = 0
@@ -0,0 +1,241 @@
+"""
+One reader per sheet (or csv file), so ingestion doesn't care where rows come from
+
+Every reader offers the same few things exttools.stream_excel needs:
+ - name: the sheet name, part of the sheet cache key
+ - first_index: column number of the first column, header_dict uses these
+ - header_row(): the values of the first row
+ - iter_rows(columns): the data rows under the header as sequences of raw
+   values, columns is a hint of the column numbers that will be read
+ - close(): releases whatever the reader holds open
+
+Nothing is parsed until header_row or iter_rows is called, so a reader per
+sheet can be handed to ExcelDialog without loading any sheet
+
+DEFINITIONS:
+ - columns: column numbers as used in header_dict, counted from first_index
+"""
+
+import codecs
+import csv
+import os
+
+import xlrd
+from openpyxl import load_workbook
+
+from . import xlsxparser
+
+XLS_EXTENSIONS = (".xls",)
+CSV_EXTENSIONS = (".csv", ".tsv", ".txt")
+CSV_DELIMITERS = ",\t;|"
+SNIFF_BYTES = 64 * 1024
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),  # before utf-16, they share a prefix
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+FALLBACK_ERRORS = "orcaqr-cp1252"
+
+
+def sniff_encoding(sample: bytes) -> str:
+    """
+    BOM first, then utf-8 if the sample decodes, otherwise cp1252 which is
+    what excel and most windows exports write without a BOM
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # the sample may end halfway through a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"  # decodes any byte
+
+
+def cp1252_fallback(exc: UnicodeError) -> tuple[str, int]:
+    """
+    decode error handler for bytes the sniffed encoding can't read, mostly
+    cp1252 further down a file whose sniffed head was plain utf-8, bytes
+    cp1252 leaves undefined are read as latin-1
+    """
+    if not isinstance(exc, UnicodeDecodeError):
+        raise exc
+    text = []
+    for byte in exc.object[exc.start : exc.end]:
+        try:
+            text.append(bytes([byte]).decode("cp1252"))
+        except UnicodeDecodeError:
+            text.append(chr(byte))
+    return "".join(text), exc.end
+
+
+codecs.register_error(FALLBACK_ERRORS, cp1252_fallback)
+
+
+def sniff_delimiter(sample: str, default: str) -> str:
+    # only whole lines are sniffed, a cut off last line skews the counts
+    lines = sample.splitlines()
+    if len(lines) > 1:
+        lines = lines[:-1]
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return default
+
+
+class XlsxReader:
+    first_index = 1
+
+    def __init__(self, sheet: object):
+        # an xlsxparser.XlsxSheet or an openpyxl read-only worksheet
+        self.sheet = sheet
+        self.name = sheet.title
+
+    def header_row(self) -> list:
+        if isinstance(self.sheet, xlsxparser.XlsxSheet):
+            return [cell.value for cell in self.sheet.header_row()]
+        return [cell.value for cell in self.sheet[1]]
+
+    def iter_rows(self, columns: list[int] = None):
+        if isinstance(self.sheet, xlsxparser.XlsxSheet):
+            return self.sheet.iter_rows(min_row=2, columns=columns)
+        return self.sheet.iter_rows(min_row=2, values_only=True)
+
+    def close(self) -> None:
+        if not isinstance(self.sheet, xlsxparser.XlsxSheet):
+            self.sheet.parent.close()  # openpyxl read-only keeps the zip open
+
+
+class XlsReader:
+    """
+    xlrd can only parse a whole sheet at a time, the workbook is opened
+    on_demand so only this sheet is parsed and it is unloaded again once
+    read, sheets of the same workbook share one xlrd book
+    """
+
+    first_index = 0
+
+    def __init__(self, book: xlrd.book.Book, name: str):
+        self.book = book
+        self.name = name
+
+    def header_row(self) -> list:
+        try:
+            sheet = self.book.sheet_by_name(self.name)
+            return sheet.row_values(0) if sheet.nrows else []
+        finally:
+            self.book.unload_sheet(self.name)
+
+    def iter_rows(self, columns: list[int] = None):
+        try:
+            sheet = self.book.sheet_by_name(self.name)
+            for row_index in range(1, sheet.nrows):
+                yield sheet.row_values(row_index)
+        finally:
+            self.book.unload_sheet(self.name)
+
+    def close(self) -> None:
+        self.book.release_resources()
+
+
+class CsvReader:
+    """
+    csv/tsv exports, the encoding and delimiter are sniffed from the start
+    of the file, the rows are then streamed with the csv module as is
+    """
+
+    first_index = 1
+
+    def __init__(self, file: str):
+        self.file = file
+        self.name = os.path.basename(file)
+        with open(file, "rb") as src:
+            sample = src.read(SNIFF_BYTES)
+        self.encoding = sniff_encoding(sample)
+        default = "\t" if file.lower().endswith(".tsv") else ","
+        text = codecs.getincrementaldecoder(self.encoding)().decode(sample)
+        self.delimiter = sniff_delimiter(text.lstrip("\ufeff"), default)
+
+    def _records(self):
+        # only the head was sniffed, the rest may not be in the same encoding
+        with open(
+            self.file, newline="", encoding=self.encoding, errors=FALLBACK_ERRORS
+        ) as src:
+            yield from csv.reader(src, delimiter=self.delimiter)
+
+    def header_row(self) -> list:
+        for record in self._records():
+            return record
+        return []
+
+    def iter_rows(self, columns: list[int] = None):
+        records = self._records()
+        next(records, None)  # header
+        return (record for record in records if record)  # skip blank lines
+
+    def close(self) -> None:
+        pass
+
+
+def reader_kind(file: str) -> str:
+    _, file_ext = os.path.splitext(file.lower())
+    if file_ext in XLS_EXTENSIONS:
+        return "xls"
+    if file_ext in CSV_EXTENSIONS:
+        return "csv"
+    return "xlsx"
+
+
+def open_readers(file: str) -> list:
+    """
+    a reader for every sheet of the file without parsing any of them,
+    used to list the sheets and probe their headers
+    """
+    match reader_kind(file):
+        case "xls":
+            book = xlrd.open_workbook(file, on_demand=True)
+            return [XlsReader(book, name) for name in book.sheet_names()]
+        case "csv":
+            return [CsvReader(file)]
+        case _:
+            workbook = xlsxparser.load_workbook(file)
+            return [XlsxReader(sheet) for sheet in workbook.worksheets]
+
+
+def sheet_names(file: str) -> list[str]:
+    # the names of the sheets, no reader is left open
+    readers = open_readers(file)
+    try:
+        return [reader.name for reader in readers]
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def open_reader(file: str, sheet_name: str, backend: str = "native") -> object:
+    """
+    reader for the one sheet that will be ingested
+
+    backend: "native" reads xlsx sheet xml directly through xlsxparser,
+    "openpyxl" goes through openpyxl's read-only mode, both give the same rows
+    """
+    if reader_kind(file) == "xlsx" and backend == "openpyxl":
+        # read-only keeps the sheet xml in the zip and parses rows on demand,
+        # so nothing is loaded until the rows are actually iterated
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        sheet = workbook[sheet_name]
+        # read-only stops at the stored <dimension>, often stale in exports
+        sheet.reset_dimensions()
+        return XlsxReader(sheet)
+    for reader in open_readers(file):
+        if reader.name == sheet_name:
+            return reader
+    raise KeyError(f"No sheet named {sheet_name} in {os.path.basename(file)}")
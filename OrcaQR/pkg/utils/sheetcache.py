@@ -0,0 +1,182 @@
+"""
+On-disk cache of parsed and validated sheets
+
+An entry is keyed by the excel file's path, size, mtime and the sheet name,
+so any change to the file misses the cache and the sheet is parsed again
+
+Entry layout (zlib compressed after the magic bytes):
+ - uint32 length of the meta block
+ - meta block (marshal): headers, header_dict, column indices, regex per
+   column and the distinct values of every column
+ - per column: the LabelTable codes array, then the invalid-cell bitmap
+
+Entries are evicted least recently used first once the cache directory
+grows over its size budget, a hit refreshes the entry's mtime
+"""
+
+import hashlib
+import marshal
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from .labeltable import LabelTable
+
+MAGIC = b"OQRC\x01"
+SUFFIX = ".olc"
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "OrcaQR", "sheets")
+
+
+def cache_key(file: str, sheet_name: str) -> tuple | None:
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return None
+    return (os.path.abspath(file), stat.st_size, stat.st_mtime_ns, str(sheet_name))
+
+
+def _entry_path(cache_dir: str, key: tuple) -> str:
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest + SUFFIX)
+
+
+def load(
+    cache_dir: str,
+    file: str,
+    sheet_name: str,
+    header_dict: dict,
+    column_indices: list[int],
+) -> tuple[LabelTable, dict] | None:
+    """
+    returns (label_table, validator_state) if an entry covering all of
+    column_indices exists, validator_state holds what RowValidator.restore
+    needs: column_indices, regex, invalid and row_count
+    """
+    key = cache_key(file, sheet_name)
+    if key is None or not cache_dir:
+        return None
+    path = _entry_path(cache_dir, key)
+    try:
+        with open(path, "rb") as entry:
+            data = entry.read()
+    except OSError:
+        return None
+    try:
+        if not data.startswith(MAGIC):
+            return None
+        body = zlib.decompress(data[len(MAGIC) :])
+        (meta_len,) = struct.unpack_from("<I", body)
+        meta = marshal.loads(body[4 : 4 + meta_len])
+        if (
+            meta["key"] != key
+            or dict(meta["header_dict"]) != header_dict
+            or meta["byteorder"] != sys.byteorder
+            or not set(column_indices) <= set(meta["column_indices"])
+        ):
+            return None
+        offset = 4 + meta_len
+        columns, invalid = {}, {}
+        for header, values, invalid_len in zip(
+            meta["headers"], meta["values"], meta["invalid_lengths"]
+        ):
+            codes = array("I")
+            codes.frombytes(body[offset : offset + meta["row_count"] * codes.itemsize])
+            offset += meta["row_count"] * codes.itemsize
+            columns[header] = (values, codes)
+            invalid[header] = bytearray(body[offset : offset + invalid_len])
+            offset += invalid_len
+    except (ValueError, EOFError, KeyError, TypeError, struct.error, zlib.error):
+        return None  # unreadable entry, treat as a miss
+    os.utime(path)  # mark as recently used
+    validator_state = {
+        "column_indices": meta["column_indices"],
+        "regex": dict(meta["regex"]),
+        "invalid": invalid,
+        "row_count": meta["row_count"],
+    }
+    return LabelTable.from_columns(meta["headers"], columns), validator_state
+
+
+def save(
+    cache_dir: str,
+    key: tuple | None,
+    header_dict: dict,
+    label_table: LabelTable,
+    validator: object,
+    budget_mb: int,
+) -> None:
+    """
+    key: cache_key of the file taken before its reader was opened, a key
+    read after the rows could belong to a newer version of the file
+    """
+    if key is None or not cache_dir:
+        return
+    columns = label_table.columns()
+    meta = {
+        "key": key,
+        "header_dict": list(header_dict.items()),
+        "headers": label_table.headers,
+        "column_indices": validator.column_indices,
+        "regex": list(validator.regex.items()),
+        "row_count": len(label_table),
+        "values": [columns[h][0] for h in label_table.headers],
+        "invalid_lengths": [len(validator.invalid[h]) for h in label_table.headers],
+        "byteorder": sys.byteorder,
+    }
+    try:
+        meta_bytes = marshal.dumps(meta)
+    except ValueError:
+        return  # headers/values marshal can't store (e.g. dates), skip caching
+    chunks = [struct.pack("<I", len(meta_bytes)), meta_bytes]
+    for header in label_table.headers:
+        chunks.append(columns[header][1].tobytes())
+        chunks.append(bytes(validator.invalid[header]))
+    path = _entry_path(cache_dir, key)
+    temp_path = path + ".tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_path, "wb") as entry:
+            entry.write(MAGIC)
+            entry.write(zlib.compress(b"".join(chunks), 1))
+        os.replace(temp_path, path)
+    except OSError:
+        # read-only or full cache directory, the sheet is just not cached
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return
+    evict(cache_dir, budget_mb)
+
+
+def evict(cache_dir: str, budget_mb: int) -> None:
+    """
+    removes the least recently used entries until the cache fits the budget
+    """
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    budget = budget_mb * 1024 * 1024
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
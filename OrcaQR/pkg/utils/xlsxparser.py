@@ -0,0 +1,342 @@
+"""
+Lightweight xlsx reader that skips openpyxl's cell objects entirely
+
+The sheet xml is streamed with iterparse straight out of the zip archive,
+shared strings are resolved through a prebuilt index and only the requested
+columns are converted to python values
+
+Values are converted the same way openpyxl does with data_only=True, so
+rows coming out of XlsxSheet.iter_rows are interchangeable with those of
+an openpyxl read-only worksheet
+
+DEFINITIONS:
+ - part: a file inside the xlsx zip archive, e.g. xl/worksheets/sheet1.xml
+ - columns: 1-indexed column numbers, same as openpyxl and header_dict
+"""
+
+import os
+import posixpath
+import zipfile
+from collections import namedtuple
+from xml.etree.ElementTree import iterparse, parse
+
+from openpyxl.styles.numbers import (
+    BUILTIN_FORMATS,
+    is_date_format,
+    is_timedelta_format,
+)
+from openpyxl.utils.datetime import (
+    CALENDAR_MAC_1904,
+    CALENDAR_WINDOWS_1900,
+    from_excel,
+    from_ISO8601,
+)
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+WORKSHEET_REL = f"{REL_NS}/worksheet"
+DOCUMENT_REL = f"{REL_NS}/officeDocument"
+
+ROW_TAG = f"{{{MAIN_NS}}}row"
+CELL_TAG = f"{{{MAIN_NS}}}c"
+VALUE_TAG = f"{{{MAIN_NS}}}v"
+TEXT_TAG = f"{{{MAIN_NS}}}t"
+RUN_TAG = f"{{{MAIN_NS}}}r"
+STRING_TAG = f"{{{MAIN_NS}}}si"
+INLINE_TAG = f"{{{MAIN_NS}}}is"
+
+# mimics openpyxl's cell.value for get_headers
+XlsxCell = namedtuple("XlsxCell", "value")
+
+_column_cache = {}
+
+
+def column_index(letters: str) -> int:
+    # "A" -> 1, "AB" -> 28, cached since the same letters repeat every row
+    index = _column_cache.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + ord(char) - 64
+        _column_cache[letters] = index
+    return index
+
+
+def split_ref(ref: str) -> tuple[int, int]:
+    # "AB12" -> (row 12, column 28)
+    letters = ref.rstrip("0123456789")
+    return int(ref[len(letters) :]), column_index(letters)
+
+
+def cast_number(value: str):
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def string_content(node) -> str:
+    # plain text plus rich text runs, phonetic runs are left out like openpyxl
+    snippets = []
+    for child in node:
+        if child.tag == TEXT_TAG:
+            snippets.append(child.text or "")
+        elif child.tag == RUN_TAG:
+            text = child.find(TEXT_TAG)
+            if text is not None and text.text is not None:
+                snippets.append(text.text)
+    return "".join(snippets)
+
+
+def read_shared_strings(archive: zipfile.ZipFile, count: int = None) -> list[str]:
+    # count: stop after the first count strings, the rest aren't parsed
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as src:
+        for _, node in iterparse(src):
+            if count is not None and len(strings) >= count:
+                break
+            if node.tag == STRING_TAG:
+                strings.append(string_content(node).replace("x005F_", ""))
+                node.clear()
+    return strings
+
+
+def read_style_formats(archive: zipfile.ZipFile) -> tuple[set, set]:
+    """
+    returns the cell style indexes that hold dates and timedeltas,
+    same indexing as openpyxl's workbook._date_formats
+    """
+    date_formats, timedelta_formats = set(), set()
+    if "xl/styles.xml" not in archive.namelist():
+        return date_formats, timedelta_formats
+    with archive.open("xl/styles.xml") as src:
+        root = parse(src).getroot()
+    custom = {
+        int(fmt.get("numFmtId")): fmt.get("formatCode")
+        for fmt in root.iter(f"{{{MAIN_NS}}}numFmt")
+    }
+    cell_xfs = root.find(f"{{{MAIN_NS}}}cellXfs")
+    if cell_xfs is None:
+        return date_formats, timedelta_formats
+    for idx, xf in enumerate(cell_xfs.iter(f"{{{MAIN_NS}}}xf")):
+        num_fmt_id = int(xf.get("numFmtId", 0))
+        fmt = custom.get(num_fmt_id, BUILTIN_FORMATS.get(num_fmt_id))
+        if fmt is None:
+            continue
+        if is_date_format(fmt):
+            date_formats.add(idx)
+        if is_timedelta_format(fmt):
+            timedelta_formats.add(idx)
+    return date_formats, timedelta_formats
+
+
+def _rels_path(part: str) -> str:
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, "_rels", f"{name}.rels")
+
+
+def _read_rels(archive: zipfile.ZipFile, part: str) -> dict[str, tuple[str, str]]:
+    # {rel id: (rel type, absolute part path)}
+    rels = {}
+    rels_path = _rels_path(part)
+    if rels_path not in archive.namelist():
+        return rels
+    folder = posixpath.dirname(part)
+    with archive.open(rels_path) as src:
+        for rel in parse(src).getroot().iter(f"{{{PKG_REL_NS}}}Relationship"):
+            target = rel.get("Target")
+            if target.startswith("/"):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            rels[rel.get("Id")] = (rel.get("Type"), target)
+    return rels
+
+
+class XlsxWorkbook:
+    """
+    Holds the sheet listing and the lookups shared by every sheet
+    (shared strings, date styles, epoch)
+
+    The archive is reopened for every pass over a sheet, so refreshes pick
+    up changes to the file, the lookups are rebuilt when the file changes
+    """
+
+    def __init__(self, file: str):
+        self.file = file
+        self._stat = None
+        self.shared_strings = []
+        self.date_formats = set()
+        self.timedelta_formats = set()
+        self.epoch = CALENDAR_WINDOWS_1900
+        with zipfile.ZipFile(file) as archive:
+            self.worksheets, self.sheetnames = self._find_sheets(archive)
+
+    def _find_sheets(self, archive: zipfile.ZipFile):
+        workbook_part = "xl/workbook.xml"
+        for rel_type, target in _read_rels(archive, "").values():
+            if rel_type == DOCUMENT_REL:
+                workbook_part = target
+        rels = _read_rels(archive, workbook_part)
+        with archive.open(workbook_part) as src:
+            root = parse(src).getroot()
+        workbook_pr = root.find(f"{{{MAIN_NS}}}workbookPr")
+        if workbook_pr is not None and workbook_pr.get("date1904") in ("1", "true"):
+            self.epoch = CALENDAR_MAC_1904
+        worksheets, sheetnames = [], []
+        for sheet in root.iter(f"{{{MAIN_NS}}}sheet"):
+            rel_type, part = rels.get(sheet.get(f"{{{REL_NS}}}id"), (None, None))
+            sheetnames.append(sheet.get("name"))
+            if rel_type == WORKSHEET_REL:  # chartsheets have no rows
+                worksheets.append(XlsxSheet(self, sheet.get("name"), part))
+        return worksheets, sheetnames
+
+    def open(self) -> zipfile.ZipFile:
+        archive = zipfile.ZipFile(self.file)
+        stat = os.stat(self.file)
+        stat = (stat.st_size, stat.st_mtime_ns)
+        if stat != self._stat:
+            self.shared_strings = read_shared_strings(archive)
+            self.date_formats, self.timedelta_formats = read_style_formats(archive)
+            self._stat = stat
+        return archive
+
+
+class XlsxSheet:
+    def __init__(self, workbook: XlsxWorkbook, title: str, part: str):
+        self.parent = workbook
+        self.title = title
+        self._part = part
+
+    def __getitem__(self, row_number: int) -> tuple[XlsxCell]:
+        for row in self.iter_rows(min_row=row_number, max_row=row_number):
+            return tuple(XlsxCell(value) for value in row)
+        return ()
+
+    def header_row(self) -> tuple[XlsxCell]:
+        """
+        reads row 1 without opening the workbook's lookups, the sheet xml
+        is abandoned after the first row and the shared strings are only
+        read up to the highest index the row refers to
+        """
+        with zipfile.ZipFile(self.parent.file) as archive:
+            with archive.open(self._part) as src:
+                cells = []
+                for _, elem in iterparse(src):
+                    if elem.tag == ROW_TAG:
+                        r = elem.get("r")
+                        if not r or int(float(r)) == 1:
+                            cells = list(elem)
+                        break
+            string_ids = [
+                int(cell.findtext(VALUE_TAG))
+                for cell in cells
+                if cell.get("t") == "s" and cell.findtext(VALUE_TAG)
+            ]
+            shared_strings = read_shared_strings(
+                archive, max(string_ids, default=-1) + 1
+            )
+            date_formats, _ = read_style_formats(archive)
+        values = {}
+        col_counter = 0
+        for cell in cells:
+            ref = cell.get("r")
+            col_counter = split_ref(ref)[1] if ref else col_counter + 1
+            values[col_counter] = self._cell_value(cell, shared_strings, date_formats)
+        row = [None] * max(values, default=0)
+        for col, value in values.items():
+            row[col - 1] = value
+        return tuple(XlsxCell(value) for value in row)
+
+    def iter_rows(
+        self,
+        min_row: int = 1,
+        max_row: int = None,
+        columns: list[int] = None,
+        values_only: bool = True,
+    ):
+        """
+        yields a tuple of values per row starting at min_row, missing rows
+        are yielded empty like openpyxl's read-only worksheet
+
+        columns: only these columns are converted, the others are left as
+        None, rows are then only as long as the largest requested column
+        """
+        wanted = set(columns) if columns else None
+        width = max(wanted) if wanted else None
+        workbook = self.parent
+        with workbook.open() as archive, archive.open(self._part) as src:
+            shared_strings = workbook.shared_strings
+            date_formats = workbook.date_formats
+            row_counter = 0
+            counter = min_row
+            for _, elem in iterparse(src):
+                # the <dimension> ref is not trusted, exporters often leave
+                # it stale, only an explicit max_row stops early
+                tag = elem.tag
+                if tag != ROW_TAG:
+                    continue
+                r = elem.get("r")
+                row_counter = int(float(r)) if r else row_counter + 1
+                if max_row is not None and row_counter > max_row:
+                    break
+                if row_counter < counter:
+                    elem.clear()
+                    continue
+                while counter < row_counter:
+                    counter += 1
+                    yield (None,) * width if width else ()
+                counter += 1
+
+                values = {}
+                col_counter = 0
+                for cell in elem:
+                    ref = cell.get("r")
+                    col_counter = split_ref(ref)[1] if ref else col_counter + 1
+                    if wanted is not None and col_counter not in wanted:
+                        continue
+                    values[col_counter] = self._cell_value(
+                        cell, shared_strings, date_formats
+                    )
+                elem.clear()
+                row_width = width or max(values, default=0)
+                row = [None] * row_width
+                for col, value in values.items():
+                    if col <= row_width:
+                        row[col - 1] = value
+                yield tuple(row)
+
+    def _cell_value(self, cell, shared_strings, date_formats):
+        data_type = cell.get("t", "n")
+        if data_type == "inlineStr":
+            child = cell.find(INLINE_TAG)
+            return string_content(child) if child is not None else None
+        value = cell.findtext(VALUE_TAG, None) or None
+        if value is None:
+            return None
+        match data_type:
+            case "n":
+                value = cast_number(value)
+                style_id = int(cell.get("s", 0))
+                if style_id in date_formats:
+                    try:
+                        value = from_excel(
+                            value,
+                            self.parent.epoch,
+                            timedelta=style_id in self.parent.timedelta_formats,
+                        )
+                    except (OverflowError, ValueError):
+                        value = "#VALUE!"
+            case "s":
+                value = shared_strings[int(value)]
+            case "b":
+                value = bool(int(value))
+            case "d":
+                value = from_ISO8601(value)
+        return value
+
+
+def load_workbook(file: str) -> XlsxWorkbook:
+    return XlsxWorkbook(file)
@@ -16,9 +16,11 @@ barcode, text, sizes are defined in dots (aka pixels), take dpmm * pix
 Printer interface:
 """
 
+import math
 import zpl
+from zpl.label import compress_zpl_data
 from zebra import Zebra
-from PIL import Image
+from PIL import Image, ImageChops
 
 
 def zpl_size_translator(
@@ -47,8 +49,9 @@ def zpl_size_translator(
 
 
 def img_to_print(
-    temp_label_paths: list[str],
+    label_images: list[Image.Image],
     label_settings_mm: tuple[tuple[int, int], int],
+    label_size_pix: tuple[int, int] = None,
 ) -> object:
     """
     generator to draw img graphics into zpl code (literally)
@@ -62,20 +65,20 @@ def img_to_print(
         label_settings_mm[1],
         label_settings_mm[2],
     )
-    for i, label_path in enumerate(temp_label_paths):
+    for i, label_image in enumerate(label_images):
         zpl_label = zpl.Label(
             width=label_settings_print[0][0],
             height=label_settings_print[0][1],
             dpmm=label_settings_mm[1],
         )
         zpl_label.origin(0, 0)
-        __temp_label_img = Image.open(label_path)
-        __rotated_img = __temp_label_img.rotate(90, expand=True)
-        zpl_label.write_graphic(
+        __rotated_img = label_image.rotate(90, expand=True)
+        write_graphic(
+            zpl_label,
             __rotated_img,
             width=label_settings_print[0][0],
             height=label_settings_print[0][1],
-            compression_type="A",
+            dots=label_size_pix[::-1] if label_size_pix else None,
         )
         zpl_label.endorigin()
         # pure_label_path = PurePath(label_path).stem + ".zpl"
@@ -83,32 +86,61 @@ def img_to_print(
 
 
 def img_to_zpl(
-    temp_label_paths: list[str],
+    label_images: list[Image.Image],
     label_settings_mm: tuple[tuple[int, int], int],
+    label_size_pix: tuple[int, int] = None,
 ) -> object:
     """
     generator to draw img graphics into zpl code (literally)
     """
     print(label_settings_mm)
-    for i, label_path in enumerate(temp_label_paths):
+    for i, label_image in enumerate(label_images):
         zpl_label = zpl.Label(
             width=label_settings_mm[0][0],
             height=label_settings_mm[0][1],
             dpmm=label_settings_mm[1],
         )
         zpl_label.origin(0, 0)
-        __temp_label_img = Image.open(label_path)
-        zpl_label.write_graphic(
-            __temp_label_img,
+        write_graphic(
+            zpl_label,
+            label_image,
             width=label_settings_mm[0][0],
             height=label_settings_mm[0][1],
-            compression_type="A",
+            dots=label_size_pix,
         )
         zpl_label.endorigin()
         # pure_label_path = PurePath(label_path).stem + ".zpl"
         yield zpl_label
 
 
+def write_graphic(
+    zpl_label: object,
+    img: Image.Image,
+    width: float,
+    height: float,
+    dots: tuple[int, int] = None,
+):
+    """
+    ^GFA graphic of img, width and height in mm
+
+    dots: the label's size in printer dots, the pixel size it was rendered
+    at. 1-bit images of that size are packed as they are, anything else
+    goes through zpl's own resize and threshold (to width * dpmm, dpmm is
+    rounded so that is a few dots off the printer at 144 and 300 dpi)
+    """
+    if img.mode != "1" or img.size != tuple(dots or ()):
+        return zpl_label.write_graphic(
+            img, width=width, height=height, compression_type="A"
+        )
+    # zpl sets a bit for a black dot, pillow for a white pixel
+    inverted = ImageChops.logical_xor(img, Image.new("1", img.size, 1))
+    data = compress_zpl_data(inverted.tobytes().hex().upper())
+    bytes_per_row = math.ceil(img.width / 8)
+    total_bytes = bytes_per_row * img.height
+    zpl_label.code += "^GFA,%i,%i,%i,%s" % (len(data), total_bytes, bytes_per_row, data)
+    return height
+
+
 def write_zpl(
     img_coords_maps: list[dict[int, tuple[object, tuple[int, int], tuple[int, int]]]],
     element_maps: list[dict[int, dict[str, object, int]]],